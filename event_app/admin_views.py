@@ -1,16 +1,64 @@
 from django.shortcuts import render,redirect, get_object_or_404
 from django.contrib import messages
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, Value
+from django.db.models.functions import Concat, Trim
+from django.http import HttpResponseBadRequest
+from django.urls import reverse
+from django.utils import timezone
+from collections import defaultdict
 
 from .models import Event, Rejection, EventRegistrations, BudgetItem
 from .forms import EventForm
-
+from .log import get_logger
+from .views import is_admin
+from .tags import refresh_counts_for_events
+from .facets import refresh_facets_for_events
+from .tasks import push_user_notifications
+from .filters import AdminEventFilter
+
+logger = get_logger(__name__)
+
+
+# Status badge metadata for admin/events.html, built once at import
+STATUS_BADGES = {
+    Event.PENDING: {'label': 'Pending', 'css': 'bg-primary'},
+    Event.DRAFT: {'label': 'Draft', 'css': 'bg-secondary'},
+    Event.CANCELLED: {'label': 'Cancelled', 'css': 'bg-danger'},
+    Event.REJECTED: {'label': 'Rejected', 'css': 'badge-rejected'},
+    Event.PUBLISHED: {'label': 'Published', 'css': 'bg-success'},
+}
+UNKNOWN_BADGE = {'label': '', 'css': 'bg-secondary'}
 
 @login_required
 def events_list_view(request):
-    events = Event.objects.exclude(status=Event.DRAFT).order_by('-created_at')
-
-    return render(request, 'admin/events.html', {'events': events})
+    events = (
+        Event.objects.exclude(status=Event.DRAFT)
+        .select_related('organizer')
+        .annotate(
+            registration_count=Count('event_registrations'),
+            organizer_full_name=Trim(Concat('organizer__first_name', Value(' '), 'organizer__last_name')),
+        )
+        .order_by('-created_at')
+    )
+    event_filter = AdminEventFilter(request.GET, queryset=events)
+
+    paginator = Paginator(event_filter.qs, 25)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    for event in page_obj:
+        event.status_badge = STATUS_BADGES.get(event.status, UNKNOWN_BADGE)
+
+    query = request.GET.copy()
+    query.pop('page', None)
+    context = {
+        'events': page_obj,
+        'page_obj': page_obj,
+        'filter': event_filter,
+        'query_string': query.urlencode(),
+    }
+    return render(request, 'admin/events.html', context)
 
 def preview_event(request, event_id):
     event = get_object_or_404(Event, id=event_id)
@@ -19,7 +67,7 @@ def preview_event(request, event_id):
         if event.budget:
             budget_items = BudgetItem.objects.filter(budget=event.budget.id)
     except Exception as e:
-        print(f"Could not load budget items: {e}")
+        logger.warning('Could not load budget items for event %s', event_id, error=str(e))
 
     return render(request, 'admin/preview.html', {'event': event, 'budget_items': budget_items})
 
@@ -34,8 +82,7 @@ def event_approval_view(request, event_id):
 
     if request.method == 'POST':
         event.status = Event.PUBLISHED
-        event.save()
-        event.save(update_fields=['status']) 
+        event.save(update_fields=['status', 'updated_at'])
 
         messages.success(request, f'{event.title} has been successfully approved!!')
         return redirect('preview', event_id)
@@ -55,11 +102,71 @@ def reject_event_view(request, event_id):
         Rejection.objects.create(event=event, admin=admin, message=message)
 
         event.status = Event.REJECTED
-        event.save()
+        event.save(update_fields=['status', 'updated_at'])
         return redirect('preview', event_id)
     
     return render(request, 'admin/preview.html', {'event': event})
 
+MODERATION_ACTIONS = {
+    'approve': (Event.PUBLISHED, 'approved'),
+    'reject': (Event.REJECTED, 'rejected'),
+}
+
+@login_required
+@user_passes_test(is_admin)
+def bulk_moderate_events_view(request):
+    '''Approve or reject many events at once with one UPDATE'''
+    if request.method != 'POST':
+        return redirect('events')
+
+    action = request.POST.get('action')
+    if action not in MODERATION_ACTIONS:
+        messages.error(request, 'Choose approve or reject.')
+        return redirect('events')
+    status, verb = MODERATION_ACTIONS[action]
+    try:
+        selected = [int(event_id) for event_id in request.POST.getlist('event_ids')]
+    except ValueError:
+        return HttpResponseBadRequest('event_ids must be integers')
+
+    events = list(
+        Event.objects.filter(id__in=selected)
+        .exclude(status__in=[Event.DRAFT, status])
+        .values_list('id', 'title', 'organizer_id')
+    )
+    if not events:
+        messages.warning(request, 'No events selected that need moderating.')
+        return redirect('events')
+    event_ids = [event_id for event_id, _title, _organizer_id in events]
+
+    with transaction.atomic():
+        Event.objects.filter(id__in=event_ids).update(status=status, updated_at=timezone.now())
+        if status == Event.REJECTED:
+            message = request.POST.get('message')
+            Rejection.objects.bulk_create([
+                Rejection(event_id=event_id, admin=request.user, message=message) for event_id in event_ids
+            ])
+
+    # Queryset updates skip Event.save, refresh the denormalized counts here
+    refresh_counts_for_events(event_ids)
+    refresh_facets_for_events(event_ids)
+
+    titles_by_organizer = defaultdict(list)
+    for _event_id, title, organizer_id in events:
+        titles_by_organizer[organizer_id].append(title)
+    push_user_notifications.enqueue(notifications=[
+        {
+            'user_id': organizer_id,
+            'message': f'{len(titles)} of your events {"was" if len(titles) == 1 else "were"} {verb}: {", ".join(titles)}'[:255],
+            'url': reverse('organizer_overview'),
+        }
+        for organizer_id, titles in titles_by_organizer.items()
+    ])
+
+    logger.info('Bulk moderation', action=action, events=len(event_ids), organizers=len(titles_by_organizer), admin=request.user.id)
+    messages.success(request, f'{len(event_ids)} event(s) {verb}.')
+    return redirect('events')
+
 @login_required
 def registered_user_in_event(request, event_id):
     event = get_object_or_404(Event, id=event_id)
@@ -0,0 +1,225 @@
+"""
+Answer distributions for dynamic registration form fields.
+
+``FormFieldAnswerStat`` holds one row per (form field, answer bucket) with
+the number of registrations in it: a row per choice for select and radio
+fields, per ticked choice for checkboxes, yes/no for booleans and a
+histogram bin for numbers. Registrations add to their buckets in the same
+transaction (``record_answers``) and deleting one takes its answers back
+out (``forget_answers``, from a pre_delete receiver), so the organizer
+charts are one small query instead of a pass over every answer.
+
+Buckets are computed from the field as it is when the answer is counted.
+After a field's choices or number bounds change, run
+``rebuild_answer_stats --event <id>`` to recount with the new buckets.
+
+``rebuild_stats`` recounts from scratch with GROUP BY queries over the
+answer values, in both storages (see answers.py). Python only touches
+each distinct value once, never each registration.
+"""
+import json
+import math
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, QuerySet
+from django.db.models.functions import Greatest
+from django.db.models.signals import pre_delete
+
+from .answers import AnswerValue, get_answers
+from .models import Event, EventRegistrations, FormField, FormFieldAnswerStat, RegistrationFieldValue
+
+CHOICE_TYPES = ('select', 'radio')
+STAT_TYPES = CHOICE_TYPES + ('checkbox', 'boolean', 'number')
+HISTOGRAM_BINS = 10
+BOOLEAN_LABELS = {True: 'Yes', False: 'No'}
+
+
+def _number_bucket(form_field, value):
+    value = float(value)
+    low, high = form_field.min_value, form_field.max_value
+    if low is not None and high is not None and high > low:
+        width = (high - low) / HISTOGRAM_BINS
+        index = min(max(int((value - low) // width), 0), HISTOGRAM_BINS - 1)
+        start = low + index * width
+        return f'{start:g}–{start + width:g}', start
+    # Unbounded fields get one bin per order of magnitude
+    if value < 0:
+        return '< 0', -1.0
+    if value < 1:
+        return '0–1', 0.0
+    start = 10.0 ** math.floor(math.log10(value))
+    return f'{start:g}–{start * 10:g}', start
+
+
+def buckets(form_field, value):
+    """``[(bucket, sort_key)]`` that one answer ``value`` to ``form_field`` counts towards"""
+    if value in (None, '', []):
+        return []
+    field_type = form_field.field_type
+    if field_type in CHOICE_TYPES:
+        return [(str(value), 0.0)]
+    if field_type == 'checkbox':
+        values = value if isinstance(value, list) else [value]
+        return [(str(choice), 0.0) for choice in dict.fromkeys(values)]
+    if field_type == 'boolean':
+        if isinstance(value, str):
+            value = value.lower() in ('true', '1')
+        return [(BOOLEAN_LABELS[bool(value)], 0.0)]
+    if field_type == 'number':
+        try:
+            return [_number_bucket(form_field, value)]
+        except (TypeError, ValueError):
+            return []
+    return []
+
+
+def _add(counts, sort_keys, form_field, value, times=1):
+    for bucket, sort_key in buckets(form_field, value):
+        key = (form_field.id, bucket[:255])
+        counts[key] += times
+        sort_keys[key] = sort_key
+
+
+def _answer_counts(form_fields, answers):
+    counts, sort_keys = Counter(), {}
+    for form_field in form_fields:
+        if form_field.field_type in STAT_TYPES:
+            for values in answers:
+                _add(counts, sort_keys, form_field, values.get(form_field.id))
+    return counts, sort_keys
+
+
+def record_answers(form_fields, answers):
+    """
+    Count ``answers`` (a list of ``{field id: value}``, one per new
+    registration) for the statistics of ``form_fields``.
+    """
+    counts, sort_keys = _answer_counts(form_fields, answers)
+    for (field_id, bucket), count in counts.items():
+        stats = FormFieldAnswerStat.objects.filter(form_field_id=field_id, bucket=bucket)
+        if stats.update(count=F('count') + count):
+            continue
+        try:
+            with transaction.atomic():
+                FormFieldAnswerStat.objects.create(
+                    form_field_id=field_id, bucket=bucket, sort_key=sort_keys[(field_id, bucket)], count=count,
+                )
+        except IntegrityError:
+            # Another registration created the bucket first
+            stats.update(count=F('count') + count)
+
+
+def forget_answers(form_fields, answers):
+    """Take ``answers`` of deleted registrations back out of the statistics"""
+    counts, _sort_keys = _answer_counts(form_fields, answers)
+    for (field_id, bucket), count in counts.items():
+        FormFieldAnswerStat.objects.filter(form_field_id=field_id, bucket=bucket).update(
+            count=Greatest(F('count') - count, 0),
+        )
+
+
+def _registration_deleted(sender, instance, origin=None, **kwargs):
+    # Deleting the event or its fields deletes their statistics as well
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model in (Event, FormField):
+        return
+    form_fields = FormField.objects.filter(event_id=instance.event_id, field_type__in=STAT_TYPES)
+    values = {int(field_id): value for field_id, value in get_answers(instance).items()}
+    forget_answers(form_fields, [values])
+
+
+def install():
+    """Connect the receiver that keeps the statistics right when registrations are deleted"""
+    pre_delete.connect(_registration_deleted, sender=EventRegistrations, dispatch_uid='answer_stats_registration_deleted')
+
+
+def _count_legacy(form_fields, counts, sort_keys):
+    """Answers still stored as RegistrationFieldValue rows, grouped by value in the DB"""
+    columns = {'select': 'text_value', 'radio': 'text_value', 'boolean': 'boolean_value', 'number': 'number_value'}
+    values = RegistrationFieldValue.objects.filter(registration__form_version__isnull=True)
+    for form_field in form_fields:
+        column = columns.get(form_field.field_type, 'selected_choices')
+        rows = (
+            values.filter(form_field=form_field).values_list(column)
+            .annotate(registrations=Count('id')).order_by()
+        )
+        for value, registrations in rows:
+            if form_field.field_type == 'checkbox':
+                try:
+                    value = json.loads(value) if value else []
+                except json.JSONDecodeError:
+                    continue
+            _add(counts, sort_keys, form_field, value, registrations)
+
+
+def _count_documents(form_fields, counts, sort_keys):
+    """Answers in the JSON documents, grouped by the extracted value in the DB"""
+    for form_field in form_fields:
+        rows = (
+            EventRegistrations.objects.filter(event_id=form_field.event_id, form_version__isnull=False)
+            .values_list(AnswerValue(form_field.id))
+            .annotate(registrations=Count('id')).order_by()
+        )
+        for value, registrations in rows:
+            if value is None:
+                continue
+            if form_field.field_type == 'checkbox':
+                try:
+                    value = json.loads(value)
+                except json.JSONDecodeError:
+                    continue
+            _add(counts, sort_keys, form_field, value, registrations)
+
+
+def rebuild_stats(event_ids=None):
+    """Recount the statistics of ``event_ids`` (all events if None), returns the number of buckets"""
+    form_fields = FormField.objects.filter(field_type__in=STAT_TYPES)
+    if event_ids is not None:
+        form_fields = form_fields.filter(event_id__in=event_ids)
+    form_fields = list(form_fields)
+
+    counts, sort_keys = Counter(), {}
+    _count_legacy(form_fields, counts, sort_keys)
+    _count_documents(form_fields, counts, sort_keys)
+
+    with transaction.atomic():
+        FormFieldAnswerStat.objects.filter(form_field__in=form_fields).delete()
+        created = FormFieldAnswerStat.objects.bulk_create(
+            (
+                FormFieldAnswerStat(form_field_id=field_id, bucket=bucket, sort_key=sort_keys[(field_id, bucket)], count=count)
+                for (field_id, bucket), count in counts.items()
+            ),
+            batch_size=1000,
+        )
+    return len(created)
+
+
+def event_answer_charts(event):
+    """Chart data per statistics field of ``event``: ``{'label', 'type', 'labels', 'counts'}``"""
+    form_fields = [form_field for form_field in event.form_fields.all() if form_field.field_type in STAT_TYPES]
+    stats = {}
+    for stat in FormFieldAnswerStat.objects.filter(form_field__event=event).order_by('sort_key', 'bucket'):
+        stats.setdefault(stat.form_field_id, {})[stat.bucket] = stat.count
+
+    charts = []
+    for form_field in form_fields:
+        counts = stats.get(form_field.id, {})
+        if form_field.field_type in CHOICE_TYPES + ('checkbox',):
+            # Every current choice, including ones nobody picked, then any retired ones
+            labels = [str(choice) for choice in form_field.get_choices_list()]
+            labels += [bucket for bucket in counts if bucket not in labels]
+        elif form_field.field_type == 'boolean':
+            labels = list(BOOLEAN_LABELS.values())
+        else:
+            labels = list(counts)
+        if not any(counts.values()):
+            continue
+        charts.append({
+            'id': form_field.id,
+            'label': form_field.label,
+            'type': form_field.field_type,
+            'labels': labels,
+            'counts': [counts.get(label, 0) for label in labels],
+        })
+    return charts
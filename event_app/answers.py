@@ -0,0 +1,355 @@
+"""
+Registration answers as one JSON document per registration.
+
+``RegistrationFieldValue`` keeps one row per answer with a typed column per
+field type, so reading a registration back means a join plus a
+``form_field`` lookup per row. The document mode stores the answers on the
+registration itself::
+
+    {"fields": {"<form field id>": <typed value>, ...}, "filters": [...]}
+
+Answers are validated against a ``RegistrationFormSchema``, an immutable
+snapshot of the event's form fields. A new version is recorded whenever the
+fields change, identified by a digest of their definition, and each
+registration keeps the ``form_version`` it was validated against. Up to
+``FILTER_SLOTS`` select, radio or yes/no fields get a slot in ``filters``
+that a generated, indexed column (``answer_filter_N``) exposes for
+filtering; empty slots hold ``''`` rather than JSON null, which MySQL would
+turn into the string 'null'. ``filter_by_answer`` filters the organizer's
+attendee list on them.
+
+``REGISTRATION_ANSWERS_STORAGE`` picks the mode: ``'rows'`` (legacy),
+``'dual'`` (both, the migration step) or ``'json'``. Switch to ``'dual'``,
+run ``migrate_registration_answers`` to convert existing registrations,
+then switch to ``'json'``.
+"""
+import hashlib
+import json
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import F, Func, Max, Prefetch, Q, TextField, Value
+from django.db.models.lookups import Exact
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .log import get_logger
+from .models import EventRegistrations, FormField, RegistrationFieldValue, RegistrationFormSchema
+
+logger = get_logger(__name__)
+
+ROWS = 'rows'
+DUAL = 'dual'
+JSON = 'json'
+
+FILTER_SLOTS = 3
+EMPTY_FILTER = ''
+FILTERABLE_TYPES = ('select', 'radio', 'boolean')
+TEXT_TYPES = ('text', 'textarea', 'email', 'phone')
+SCHEMA_TTL = 60 * 60
+
+
+def storage_mode():
+    return getattr(settings, 'REGISTRATION_ANSWERS_STORAGE', ROWS)
+
+
+def writes_rows():
+    return storage_mode() in (ROWS, DUAL)
+
+
+def writes_document():
+    return storage_mode() in (DUAL, JSON)
+
+
+def field_definitions(form_fields):
+    """Schema entries for ``form_fields``, assigning filter slots in form order"""
+    definitions, slot = [], 0
+    # Sorted here so the digest and the slots don't depend on how the caller fetched the fields
+    for form_field in sorted(form_fields, key=lambda form_field: (form_field.order, form_field.id)):
+        definition = {
+            'id': form_field.id,
+            'type': form_field.field_type,
+            'label': form_field.label,
+            'required': form_field.is_required,
+            'choices': form_field.get_choices_list(),
+            'min_value': form_field.min_value,
+            'max_value': form_field.max_value,
+            'max_length': form_field.max_length,
+            'slot': None,
+        }
+        if form_field.field_type in FILTERABLE_TYPES and slot < FILTER_SLOTS:
+            definition['slot'] = slot
+            slot += 1
+        definitions.append(definition)
+    return definitions
+
+
+def get_schema(event_id, form_fields):
+    """The ``RegistrationFormSchema`` matching ``form_fields``, recording a new version if they changed"""
+    definitions = field_definitions(form_fields)
+    digest = hashlib.md5(json.dumps(definitions, sort_keys=True).encode()).hexdigest()
+    cache_key = f'form_schema:{event_id}:{digest}'
+    schema = cache.get(cache_key)
+    if schema is None:
+        schema = RegistrationFormSchema.objects.filter(event_id=event_id, digest=digest).first()
+        if schema is None:
+            schema = _create_schema(event_id, digest, definitions)
+        cache.set(cache_key, schema, SCHEMA_TTL)
+    return schema
+
+
+def _create_schema(event_id, digest, definitions):
+    latest = RegistrationFormSchema.objects.filter(event_id=event_id).aggregate(version=Max('version'))['version']
+    try:
+        with transaction.atomic():
+            return RegistrationFormSchema.objects.create(
+                event_id=event_id, version=(latest or 0) + 1, digest=digest, fields=definitions,
+            )
+    except IntegrityError:
+        # Another registration recorded this version first
+        return RegistrationFormSchema.objects.get(event_id=event_id, digest=digest)
+
+
+def _clean_value(definition, value):
+    field_type = definition['type']
+    if field_type in TEXT_TYPES:
+        value = str(value)
+        if definition['max_length'] and len(value) > definition['max_length']:
+            raise ValidationError(f'{definition["label"]}: at most {definition["max_length"]} characters')
+        return value
+    if field_type == 'number':
+        value = float(value)
+        if definition['min_value'] is not None and value < definition['min_value']:
+            raise ValidationError(f'{definition["label"]}: at least {definition["min_value"]}')
+        if definition['max_value'] is not None and value > definition['max_value']:
+            raise ValidationError(f'{definition["label"]}: at most {definition["max_value"]}')
+        return value
+    if field_type == 'date':
+        parsed = value if isinstance(value, date) else parse_date(str(value))
+        if parsed is None:
+            raise ValidationError(f'{definition["label"]}: not a date')
+        return parsed.isoformat()
+    if field_type == 'datetime':
+        parsed = value if isinstance(value, datetime) else parse_datetime(str(value))
+        if parsed is None:
+            raise ValidationError(f'{definition["label"]}: not a date and time')
+        return parsed.isoformat()
+    if field_type in ('select', 'radio'):
+        if value not in definition['choices']:
+            raise ValidationError(f'{definition["label"]}: "{value}" is not one of the choices')
+        return value
+    if field_type == 'checkbox':
+        values = value if isinstance(value, list) else [value]
+        unknown = [choice for choice in values if choice not in definition['choices']]
+        if unknown:
+            raise ValidationError(f'{definition["label"]}: {", ".join(map(str, unknown))} not among the choices')
+        return values
+    if field_type == 'boolean':
+        return bool(value)
+    if field_type == 'file':
+        if hasattr(value, 'read'):
+            return default_storage.save(f'registration_files/{value.name}', value)
+        return str(value)
+    raise ValidationError(f'{definition["label"]}: unknown field type "{field_type}"')
+
+
+def build_document(schema, values):
+    """
+    Validate ``values`` (``{field id: value}``) against ``schema`` and return
+    the answers document. Empty answers are left out.
+    """
+    fields, filters, errors = {}, [EMPTY_FILTER] * FILTER_SLOTS, []
+    for definition in schema.fields:
+        value = values.get(definition['id'], values.get(str(definition['id'])))
+        if value in (None, '', []):
+            if definition['required'] and definition['type'] != 'boolean':
+                errors.append(f'{definition["label"]}: an answer is required')
+            continue
+        try:
+            value = _clean_value(definition, value)
+        except (ValidationError, TypeError, ValueError) as e:
+            errors.extend(e.messages if isinstance(e, ValidationError) else [f'{definition["label"]}: {e}'])
+            continue
+        fields[str(definition['id'])] = value
+        if definition['slot'] is not None:
+            filters[definition['slot']] = filter_value(value)
+    if errors:
+        raise ValidationError(errors)
+    return {'fields': fields, 'filters': filters}
+
+
+def filter_value(value):
+    """How an answer appears in its ``answer_filter_N`` column"""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def set_answers(registration, schema, values):
+    """Validate ``values`` and store them on ``registration`` (not saved)"""
+    registration.answers = build_document(schema, values)
+    registration.form_version = schema.version
+
+
+def field_value_rows(registration, form_fields, values):
+    """Unsaved ``RegistrationFieldValue`` rows for the legacy storage"""
+    stored = registration.answers.get('fields', {}) if registration.form_version is not None else {}
+    rows = []
+    for form_field in form_fields:
+        if form_field.id in values:
+            value = values[form_field.id]
+            if form_field.field_type == 'file' and str(form_field.id) in stored:
+                # Already saved for the document, point the row at the same file
+                value = stored[str(form_field.id)]
+            row = RegistrationFieldValue(registration=registration, form_field=form_field)
+            row.set_value(value)
+            rows.append(row)
+    return rows
+
+
+def get_answers(registration):
+    """``{field id (str): value}`` for ``registration``, from the document when it has one"""
+    if registration.form_version is not None:
+        return registration.answers.get('fields', {})
+    return {
+        str(row.form_field_id): row.get_value()
+        for row in registration.field_values.select_related('form_field')
+    }
+
+
+class AnswerValue(Func):
+    """
+    The answer to one form field out of the ``answers`` document, as text, or
+    as JSON with ``unquote=False``. ``KT('answers__fields__12')`` can't be used
+    for this: Django reads numeric keys as array indexes.
+    """
+    function = 'JSON_EXTRACT'
+    output_field = TextField()
+
+    def __init__(self, field_id, unquote=True):
+        self.unquote = unquote
+        super().__init__(F('answers'), Value(f'$.fields."{int(field_id)}"'))
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        if self.unquote:
+            extra_context['template'] = 'JSON_UNQUOTE(%(function)s(%(expressions)s))'
+        return self.as_sql(compiler, connection, **extra_context)
+
+
+class JSONLiteral(Func):
+    """``value`` as a JSON value, compares by type with ``AnswerValue(..., unquote=False)``"""
+    template = "JSON_EXTRACT(%(expressions)s, '$')"
+    output_field = TextField()
+
+    def __init__(self, value):
+        super().__init__(Value(json.dumps(value, cls=DjangoJSONEncoder)))
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='CAST(%(expressions)s AS JSON)', **extra_context)
+
+
+def _query_value(definition, value):
+    """A filter value from a query string, typed the way the document stores it"""
+    if definition['type'] == 'boolean' and isinstance(value, str):
+        value = value.lower() in ('true', '1', 'yes', 'on')
+    return _clean_value(definition, value)
+
+
+def filter_by_answer(queryset, event_id, field_id, value):
+    """
+    Registrations of the event that answered ``value`` to ``field_id``, in
+    every form version that has the field. A field can have a different
+    filter slot (or none) in each version, so each one gets its own
+    condition. Registrations without a document (``'rows'`` storage) never
+    match, run ``migrate_registration_answers`` first.
+    """
+    condition = Q()
+    schemas = RegistrationFormSchema.objects.filter(event_id=event_id).values_list('version', 'fields')
+    for version, fields in schemas:
+        definition = next((item for item in fields if item['id'] == field_id), None)
+        if definition is None:
+            continue
+        try:
+            answer = _query_value(definition, value)
+        except (ValidationError, TypeError, ValueError):
+            # Not a possible answer in this version
+            continue
+        if definition['slot'] is not None:
+            condition |= Q(form_version=version, **{f'answer_filter_{definition["slot"] + 1}': filter_value(answer)})
+        else:
+            condition |= Q(Exact(AnswerValue(field_id, unquote=False), JSONLiteral(answer)), form_version=version)
+    if not condition:
+        return queryset.none()
+    return queryset.filter(condition, event_id=event_id)
+
+
+def filter_options(event_id):
+    """
+    The fields of the event's current form that have a filter slot, with
+    their possible answers: ``[{'label', 'options': [{'value', 'label'}]}]``
+    where each value is ``'<field id>:<answer>'``.
+    """
+    schema = RegistrationFormSchema.objects.filter(event_id=event_id).order_by('-version').first()
+    if schema is None:
+        return []
+    options = []
+    for definition in schema.fields:
+        if definition['slot'] is None:
+            continue
+        if definition['type'] == 'boolean':
+            answers = [('true', 'Yes'), ('false', 'No')]
+        else:
+            answers = [(str(choice), str(choice)) for choice in definition['choices']]
+        options.append({
+            'label': definition['label'],
+            'options': [{'value': f'{definition["id"]}:{value}', 'label': label} for value, label in answers],
+        })
+    return options
+
+
+def migrate_registrations(batch_size=500):
+    """
+    Copy answers of registrations without a document from their
+    RegistrationFieldValue rows, one batch per transaction. Returns the
+    number of registrations converted. The rows are kept.
+    """
+    converted, last_id, schemas = 0, 0, {}
+    rows = Prefetch('field_values', queryset=RegistrationFieldValue.objects.select_related('form_field'))
+    while True:
+        batch = list(
+            EventRegistrations.objects.filter(form_version__isnull=True, id__gt=last_id)
+            .order_by('id').prefetch_related(rows)[:batch_size]
+        )
+        if not batch:
+            return converted
+        last_id = batch[-1].id
+
+        event_ids = {registration.event_id for registration in batch} - schemas.keys()
+        form_fields = {}
+        for form_field in FormField.objects.filter(event_id__in=event_ids).order_by('order', 'id'):
+            form_fields.setdefault(form_field.event_id, []).append(form_field)
+        for event_id in event_ids:
+            schemas[event_id] = get_schema(event_id, form_fields.get(event_id, []))
+
+        for registration in batch:
+            values = {}
+            for row in registration.field_values.all():
+                value = row.get_value()
+                values[row.form_field_id] = value.name if row.form_field.field_type == 'file' and value else value
+            try:
+                set_answers(registration, schemas[registration.event_id], values)
+            except ValidationError as e:
+                # Answers given before the form changed, keep them as they are
+                logger.warning('Registration answers no longer valid', registration=registration.id, errors=e.messages)
+                registration.answers = {
+                    'fields': {str(field_id): value for field_id, value in values.items() if value not in (None, '', [])},
+                    'filters': [EMPTY_FILTER] * FILTER_SLOTS,
+                }
+                registration.form_version = schemas[registration.event_id].version
+        with transaction.atomic():
+            EventRegistrations.objects.bulk_update(batch, ['answers', 'form_version'])
+        converted += len(batch)
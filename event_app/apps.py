@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class EventAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'event_app'
+
+    def ready(self):
+        from . import answer_stats, checkin, db_metrics, facets, registrations, tags
+        db_metrics.install()
+        answer_stats.install()
+        registrations.install()
+        checkin.install()
+        tags.install()
+        facets.install()
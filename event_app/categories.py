@@ -0,0 +1,75 @@
+"""
+Event category registry.
+
+Every piece of per-category metadata (label, chart colour, badge styling)
+lives here and is built once at import. Models, views, chart data and
+templates (through the ``category_info`` filter) all read from it.
+"""
+import json
+from types import MappingProxyType
+from typing import NamedTuple
+
+
+class CategoryInfo(NamedTuple):
+    value: str
+    label: str
+    chart_color: str
+    # Classes used by Event.get_category_display_info on public pages
+    display_class: str
+    # Bootstrap badge used in the admin tables
+    badge_class: str
+    badge_style: str = ''
+
+    @property
+    def display_info(self):
+        return {'label': self.label, 'color': self.display_class}
+
+
+CATEGORIES = MappingProxyType({info.value: info for info in (
+    CategoryInfo('music-arts', 'Music & Arts', '#FF6384', 'bg-purple-100 text-purple-800', 'bg-purple', 'background-color: #6f42c1 !important;'),
+    CategoryInfo('business', 'Business & Professional', '#36A2EB', '#87ceeb', 'bg-primary'),
+    CategoryInfo('sports', 'Sports & Fitness', '#FFCE56', 'bg-green-100 text-green-800', 'bg-warning text-dark'),
+    CategoryInfo('technology', 'Technology', '#4BC0C0', 'bg-gray-100 text-gray-800', 'bg-info'),
+    CategoryInfo('food-drink', 'Food & Drink', '#9966FF', 'bg-orange-100 text-orange-800', 'bg-orange', 'background-color: #fd7e14 !important;'),
+    CategoryInfo('health-wellness', 'Health & Wellness', '#FF9F40', 'bg-emerald-100 text-emerald-800', 'bg-success'),
+    CategoryInfo('education', 'Education & Learning', '#FF6384', 'bg-yellow-100 text-yellow-800', 'bg-dark'),
+    CategoryInfo('community', 'Community & Culture', '#C9CBCF', 'bg-pink-100 text-pink-800', 'bg-secondary'),
+    CategoryInfo('charity', 'Charity & Fundraising', '#4BC0C0', 'bg-red-100 text-red-800', 'bg-pink', 'background-color: #d63384 !important;'),
+    CategoryInfo('government', 'Government & Politics', '#36A2EB', 'bg-indigo-100 text-indigo-800', 'bg-indigo', 'background-color: #6610f2 !important;'),
+    CategoryInfo('tourism', 'Tourism & Hospitality', '#FFCE56', 'bg-teal-100 text-teal-800', 'bg-teal', 'background-color: #20c997 !important;'),
+)})
+
+CATEGORY_CHOICES = [(info.value, info.label) for info in CATEGORIES.values()]
+CATEGORY_LABELS = MappingProxyType(dict(CATEGORY_CHOICES))
+
+UNKNOWN_CATEGORY = CategoryInfo('', 'Other', '#C9CBCF', 'bg-secondary text-white', 'bg-secondary')
+
+
+def get_category(value):
+    return CATEGORIES.get(value) or UNKNOWN_CATEGORY._replace(value=value)
+
+
+def category_chart_payload(rows, count_key='count', total=None):
+    """
+    Chart.js pie data from aggregate rows like ``{'category': ..., 'count': n}``.
+
+    Returns the JSON string the dashboards parse (``labels``, ``data`` as
+    percentages of ``total``, ``colors``) and the rows with ``label``,
+    ``percentage`` and ``color`` added for breakdown tables.
+    """
+    rows = list(rows)
+    if total is None:
+        total = sum(row[count_key] for row in rows)
+
+    breakdown = []
+    for row in rows:
+        info = get_category(row['category'])
+        percentage = round(row[count_key] / total * 100, 1) if total else 0
+        breakdown.append({**row, 'label': info.label, 'percentage': percentage, 'color': info.chart_color})
+
+    payload = json.dumps({
+        'labels': [row['label'] for row in breakdown],
+        'data': [row['percentage'] for row in breakdown],
+        'colors': [row['color'] for row in breakdown],
+    })
+    return payload, breakdown
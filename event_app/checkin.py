@@ -0,0 +1,167 @@
+"""
+Door check-in with self-verifying ticket codes.
+
+A ticket code is ``<event_id>-<registration_id>-<mac>`` where the MAC is an
+HMAC of the ids keyed by SECRET_KEY, so scanners and the check-in endpoint
+can reject forged or mistyped codes without a DB hit. Each process keeps a
+bitset of registrations already checked in per event; a batch of scans is
+deduplicated against it and the new ones are flushed with one UPDATE. The
+UPDATE only touches rows not yet checked in, so the DB stays the source of
+truth when several processes scan the same event.
+
+A bitset is rebuilt from the DB after ``CHECK_IN_SET_TTL`` and dropped when
+one of the event's registrations is deleted, so a reset check-in or a
+re-created registration is picked up again.
+"""
+import base64
+import threading
+import time
+
+from django.db.models import Min
+from django.db.models.signals import post_delete
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .models import EventRegistrations
+
+TICKET_SALT = 'event_app.checkin'
+MAC_BYTES = 8
+CHECK_IN_BATCH_LIMIT = 1000
+CHECK_IN_SET_TTL = 60 * 10
+
+
+def _mac(event_id, registration_id):
+    digest = salted_hmac(TICKET_SALT, f'{event_id}-{registration_id}', algorithm='sha256').digest()
+    return base64.b32encode(digest[:MAC_BYTES]).decode().rstrip('=')
+
+
+def ticket_code(registration):
+    return f'{registration.event_id}-{registration.pk}-{_mac(registration.event_id, registration.pk)}'
+
+
+def verify_ticket(code, event_id):
+    """Return the registration id in ``code`` if it is a valid ticket for ``event_id``, else None"""
+    try:
+        code_event, registration_id, mac = code.strip().upper().split('-')
+        code_event, registration_id = int(code_event), int(registration_id)
+    except (AttributeError, ValueError):
+        return None
+    if code_event != event_id or not constant_time_compare(mac, _mac(event_id, registration_id)):
+        return None
+    return registration_id
+
+
+class CheckInSet:
+    """Bitset of checked-in registration ids for one event, offset by the event's first id"""
+
+    def __init__(self, event_id):
+        self.built_at = time.monotonic()
+        registrations = EventRegistrations.objects.filter(event_id=event_id)
+        self.offset = registrations.aggregate(first=Min('id'))['first'] or 0
+        self.bits = bytearray()
+        self.lock = threading.Lock()
+        for registration_id in registrations.filter(checked_in_at__isnull=False).values_list('id', flat=True):
+            self._set(registration_id)
+
+    def _position(self, registration_id):
+        index = registration_id - self.offset
+        return (index >> 3, 1 << (index & 7)) if index >= 0 else (None, 0)
+
+    def _set(self, registration_id):
+        byte, mask = self._position(registration_id)
+        if byte is None:
+            return
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(byte + 1 - len(self.bits)))
+        self.bits[byte] |= mask
+
+    def __contains__(self, registration_id):
+        byte, mask = self._position(registration_id)
+        return byte is not None and byte < len(self.bits) and bool(self.bits[byte] & mask)
+
+    def add_new(self, registration_ids):
+        """Mark ``registration_ids`` and return the ones that were not already set"""
+        new = []
+        with self.lock:
+            for registration_id in registration_ids:
+                if registration_id not in self:
+                    self._set(registration_id)
+                    new.append(registration_id)
+        return new
+
+    def discard(self, registration_ids):
+        with self.lock:
+            for registration_id in registration_ids:
+                byte, mask = self._position(registration_id)
+                if byte is not None and byte < len(self.bits):
+                    self.bits[byte] &= ~mask
+
+
+_check_in_sets = {}
+_sets_lock = threading.Lock()
+
+
+def get_check_in_set(event_id):
+    check_in_set = _check_in_sets.get(event_id)
+    if check_in_set is None or time.monotonic() - check_in_set.built_at > CHECK_IN_SET_TTL:
+        with _sets_lock:
+            check_in_set = _check_in_sets.get(event_id)
+            if check_in_set is None or time.monotonic() - check_in_set.built_at > CHECK_IN_SET_TTL:
+                check_in_set = _check_in_sets[event_id] = CheckInSet(event_id)
+    return check_in_set
+
+
+def forget_check_in_set(event_id):
+    with _sets_lock:
+        _check_in_sets.pop(event_id, None)
+
+
+def _registration_deleted(sender, instance, **kwargs):
+    forget_check_in_set(instance.event_id)
+
+
+def install():
+    """Connect the receiver that drops an event's bitset when its registrations are deleted"""
+    post_delete.connect(_registration_deleted, sender=EventRegistrations, dispatch_uid='checkin_registration_deleted')
+
+
+def check_in(event_id, codes):
+    """
+    Check in a batch of scanned ``codes`` for ``event_id``.
+
+    Returns counts of ``checked_in`` (newly recorded), ``duplicate`` (already
+    checked in, or scanned twice) and the list of ``invalid`` codes, which
+    includes validly signed codes of registrations that no longer exist.
+    """
+    valid, invalid = [], []
+    for code in codes:
+        registration_id = verify_ticket(code, event_id)
+        if registration_id is None:
+            invalid.append(code)
+        else:
+            valid.append((code, registration_id))
+
+    check_in_set = get_check_in_set(event_id)
+    new = check_in_set.add_new([registration_id for _code, registration_id in valid])
+    checked_in, missing = 0, set()
+    if new:
+        try:
+            checked_in = EventRegistrations.objects.filter(
+                event_id=event_id, id__in=new, checked_in_at__isnull=True
+            ).update(checked_in_at=timezone.now())
+            if checked_in < len(new):
+                # The rest are duplicates only if they exist and are checked in
+                checked = set(
+                    EventRegistrations.objects.filter(event_id=event_id, id__in=new, checked_in_at__isnull=False)
+                    .values_list('id', flat=True)
+                )
+                missing = set(new) - checked
+        except Exception:
+            # Let the same tickets be scanned again once the DB is back
+            check_in_set.discard(new)
+            raise
+        check_in_set.discard(missing)
+
+    invalid.extend(code for code, registration_id in valid if registration_id in missing)
+    duplicate = sum(1 for _code, registration_id in valid if registration_id not in missing) - checked_in
+    return {'checked_in': checked_in, 'duplicate': duplicate, 'invalid': invalid}
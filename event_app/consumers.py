@@ -1,6 +1,12 @@
 import json
+from asgiref.sync import async_to_sync
 from channels.generic.websocket import WebsocketConsumer
 
+from .log import get_logger
+from . import notifications
+
+logger = get_logger(__name__)
+
 class EventStatusConsumer(WebsocketConsumer):
     async def connect(self):
         self.organizer_id = self.scope['user'].id
@@ -34,16 +40,17 @@ class AdminNotificationConsumer(WebsocketConsumer):
 class NotificationConsumer(WebsocketConsumer):
     def connect(self):
         if self.scope['user'].is_authenticated:
-            print('Connected')
+            logger.debug('Notification socket connected', user=self.scope['user'].id)
             self.group_name = f'user_{self.scope["user"].id}'
-            self.channel_layer.group_add(self.group_name, self.channel_name)
+            async_to_sync(self.channel_layer.group_add)(self.group_name, self.channel_name)
             self.accept()
+            self.send(text_data=json.dumps({'unread_count': notifications.unread_count(self.scope['user'].id)}))
         else:
             self.close()
         
     def disconnect(self, close_code):
         if hasattr(self, 'group_name'):
-            self.channel_layer.group_discard(self.group_name, self.channel_name)
+            async_to_sync(self.channel_layer.group_discard)(self.group_name, self.channel_name)
 
     def receive(self, text_data):
         pass
@@ -53,4 +60,8 @@ class NotificationConsumer(WebsocketConsumer):
             'message': event['message'],
             'url': event.get('url'),
             'created_at': event.get('created_at'),
-        }))
\ No newline at end of file
+            'unread_count': event.get('unread_count'),
+        }))
+
+    def unread_count(self, event):
+        self.send(text_data=json.dumps({'unread_count': event['unread_count']}))
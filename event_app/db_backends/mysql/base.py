@@ -0,0 +1,12 @@
+from django.db.backends.mysql import base
+
+from ..pool import PooledConnectionMixin
+
+
+class DatabaseWrapper(PooledConnectionMixin, base.DatabaseWrapper):
+    def is_raw_usable(self, raw):
+        try:
+            raw.ping()
+        except Exception:
+            return False
+        return True
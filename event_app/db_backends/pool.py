@@ -0,0 +1,104 @@
+"""
+Process-wide connection pool shared by every thread.
+
+Under ASGI each request runs its sync code on a fresh thread-sensitive
+executor, so Django's per-thread persistent connections (``CONN_MAX_AGE``)
+are never reused. These backends keep closed connections in a pool shared by
+the whole process instead: ``close()`` returns the raw connection to the
+pool and the next ``connect()`` on any thread takes it back after a health
+check. Keep ``CONN_MAX_AGE`` at 0 so connections go back at request end.
+
+Extra ``DATABASES`` keys:
+
+- ``POOL_SIZE``: idle connections kept per alias, 0 disables pooling.
+- ``POOL_MAX_AGE``: seconds before a pooled connection is retired.
+"""
+import queue
+import threading
+import time
+
+from event_app import db_metrics
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias):
+    with _pools_lock:
+        if alias not in _pools:
+            _pools[alias] = queue.LifoQueue()
+        return _pools[alias]
+
+
+def drain_pool(alias):
+    """Close every idle connection pooled for ``alias``"""
+    pool = get_pool(alias)
+    while True:
+        try:
+            raw, _created_at = pool.get_nowait()
+        except queue.Empty:
+            return
+        _close_quietly(raw)
+
+
+def _close_quietly(raw):
+    try:
+        raw.close()
+    except Exception:
+        pass
+
+
+class PooledConnectionMixin:
+    pooled = True
+
+    @property
+    def pool_size(self):
+        return self.settings_dict.get('POOL_SIZE', 0)
+
+    def is_raw_usable(self, raw):
+        try:
+            cursor = raw.cursor()
+            try:
+                cursor.execute('SELECT 1')
+            finally:
+                cursor.close()
+        except Exception:
+            return False
+        return True
+
+    def get_new_connection(self, conn_params):
+        pool = get_pool(self.alias)
+        max_age = self.settings_dict.get('POOL_MAX_AGE', 300)
+        while True:
+            try:
+                raw, created_at = pool.get_nowait()
+            except queue.Empty:
+                break
+            if time.monotonic() - created_at < max_age and self.is_raw_usable(raw):
+                self._pool_created_at = created_at
+                db_metrics.record('reused', self.alias)
+                return raw
+            db_metrics.record('discarded', self.alias)
+            _close_quietly(raw)
+
+        self._pool_created_at = time.monotonic()
+        db_metrics.record('opened', self.alias)
+        return super().get_new_connection(conn_params)
+
+    def _close(self):
+        raw = self.connection
+        if raw is None:
+            return
+        pool = get_pool(self.alias)
+        # A connection closed mid-transaction or beyond the pool size is dropped
+        if self.pool_size and not self.in_atomic_block and pool.qsize() < self.pool_size:
+            try:
+                raw.rollback()
+            except Exception:
+                db_metrics.record('discarded', self.alias)
+                _close_quietly(raw)
+                return
+            pool.put((raw, self._pool_created_at))
+            return
+        db_metrics.record('closed', self.alias)
+        super()._close()
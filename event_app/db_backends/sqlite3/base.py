@@ -0,0 +1,14 @@
+from django.db.backends.sqlite3 import base
+
+from ..pool import PooledConnectionMixin
+
+
+class DatabaseWrapper(PooledConnectionMixin, base.DatabaseWrapper):
+    """Pooled SQLite backend, mostly for exercising the pool locally"""
+
+    @property
+    def pool_size(self):
+        # In-memory databases vanish with their connection
+        if self.is_in_memory_db():
+            return 0
+        return super().pool_size
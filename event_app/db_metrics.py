@@ -0,0 +1,60 @@
+"""
+In-process counters for database connection churn.
+
+``checkouts`` counts Django connects, ``opened`` physical connections. With
+the pooled backends (see db_backends/pool.py) most checkouts should be
+``reused``, ``connections_per_request`` close to 1.0 means every request is
+paying connection setup again. Counters are per process.
+"""
+import threading
+from collections import Counter
+
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+
+_lock = threading.Lock()
+_counts = Counter()
+_requests = 0
+
+EVENTS = ('checkouts', 'opened', 'reused', 'discarded', 'closed')
+
+
+def record(event, alias):
+    with _lock:
+        _counts[event, alias] += 1
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    record('checkouts', connection.alias)
+    # Pooled backends record physical opens themselves
+    if not getattr(connection, 'pooled', False):
+        record('opened', connection.alias)
+
+
+def _on_request_started(sender, **kwargs):
+    global _requests
+    with _lock:
+        _requests += 1
+
+
+def install():
+    connection_created.connect(_on_connection_created, dispatch_uid='db_metrics_connection_created')
+    request_started.connect(_on_request_started, dispatch_uid='db_metrics_request_started')
+
+
+def reset():
+    global _requests
+    with _lock:
+        _counts.clear()
+        _requests = 0
+
+
+def snapshot():
+    with _lock:
+        stats = {event: {} for event in EVENTS}
+        for (event, alias), count in _counts.items():
+            stats[event][alias] = count
+        opened = sum(stats['opened'].values())
+        stats['requests'] = _requests
+        stats['connections_per_request'] = round(opened / _requests, 3) if _requests else 0
+        return stats
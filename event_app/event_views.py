@@ -1,96 +1,172 @@
 from django.shortcuts import render,redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db import DatabaseError, transaction
+from django.db import DatabaseError, IntegrityError, transaction
 from django.db.models.functions import TruncDate
 from django.utils.safestring import mark_safe
+from django.utils.text import slugify
 from django.db.models import Count, F, Avg, Sum
 from datetime import timedelta
 from django.utils import timezone
 from django.core.paginator import Paginator
+from django.core.cache import cache
 from django.utils.timezone import now
-import requests
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from django.contrib.auth import get_user_model
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
 import json
+import asyncio
+from decimal import Decimal, InvalidOperation
 from django.views.decorators.csrf import csrf_exempt
 
 from .models import Event, Notification, Budget, BudgetItem, Rejection, EventRegistrations, FormField
 from .forms import EventForm
-from .utils import notify_event_attendees
+from .utils import apaginate, alist
 from django.forms import formset_factory
-from .forms import EventBudgetForm, BudgetItemForm, DynamicEventRegistrationForm
+from .forms import EventBudgetForm, BudgetItemForm, DynamicEventRegistrationForm, EventImportForm
+from .log import get_logger
+from .routers import read_replica
+from .sessions import mark_event_viewed
+from .tags import filter_by_tag, tag_facets
+from .facets import facet_counts
+from .answer_stats import event_answer_charts
+from .trending import arecord_activity
+from .similar import similar_events
+from .ical import attendee_events, category_events, feed_response, organizer_events, user_id_from_token
+from .categories import CATEGORY_LABELS
+from .importer import COLUMNS as IMPORT_COLUMNS, import_events
+from .checkin import CHECK_IN_BATCH_LIMIT, check_in
+from . import answers, ingest
+from .tasks import email_event_attendees, post_admin_webhook, send_admin_notification
+from .registrations import (
+    PENDING, claim_submission, complete_submission, is_registered, release_submission, remember_registered,
+)
+from .views import is_admin
+from .filters import EventFilter
 
 User = get_user_model()
+logger = get_logger(__name__)
 
-def notify_admins(message, url=None):
-    channel_layer = get_channel_layer()
-    admins = User.objects.filter(is_staff=True)
-    print('Tis is running ', len(admins))
-
-    for admin in admins:
-        notify = Notification.objects.create(user=admin, message=message, url=url)
-
-        async_to_sync(channel_layer.group_send)(
-            f'user_{admin.id}',
-            {
-                'type': 'send_notification',
-                'message': notify.message,
-                'url': notify.url,
-                'created_at': notify.created_at.strftime("%Y-%m-%d %H:%M"),
-            }
-        )
+# Idempotency results pointing at a queued registration receipt
+RECEIPT_PREFIX = 'receipt:'
+REGISTRATION_FORM_TTL = 30
 
 def register_for_event(request, event_id):
     """ Register an attendee for an event if the user doesn't exist"""
-    event = get_object_or_404(Event, id=event_id, status=Event.PUBLISHED)
+    queued = request.method == 'POST' and ingest.is_enabled()
+    # Resolve the event before claiming, a 404 would leave the claim behind
+    if queued:
+        event, form_fields = registration_form_data(event_id)
+    else:
+        event, form_fields = get_object_or_404(Event, id=event_id, status=Event.PUBLISHED), None
+
+    if request.method == 'POST':
+        # Duplicates are answered from the cache before any registration work, see registrations.py
+        submission_key = request.POST.get('idempotency_key', '')[:64]
+        previous = claim_submission(event_id, submission_key)
+        if previous == PENDING:
+            messages.info(request, 'Your registration is already being processed.')
+            return redirect('event_details', event_id=event_id)
+        if isinstance(previous, str) and previous.startswith(RECEIPT_PREFIX):
+            return redirect('registration_receipt', receipt=previous[len(RECEIPT_PREFIX):])
+        if previous is not None:
+            messages.info(request, 'You are already registered for this event.')
+            return redirect('event_details', event_id=event_id)
+        if is_registered(event_id, request.POST.get('email', '')):
+            # Our own claim, don't leave it pending
+            release_submission(event_id, submission_key)
+            messages.info(request, 'You are already registered for this event.')
+            return redirect('event_details', event_id=event_id)
 
     can_register, message = event.can_register()
     if not can_register:
+        if request.method == 'POST':
+            release_submission(event_id, submission_key)
         messages.error(request, message)
         return redirect('event_details', event_id=event_id)
     
     if request.method == 'POST':
-        form = DynamicEventRegistrationForm(event, request.POST, request.FILES)
+        form = DynamicEventRegistrationForm(event, request.POST, request.FILES, form_fields=form_fields)
+        # Uploaded files cannot be queued, those go through the synchronous path
+        if queued and not request.FILES and form.is_valid():
+            user = request.user if request.user.is_authenticated else None
+            try:
+                receipt = ingest.enqueue_registration(form, user=user)
+            except ingest.QueueFull:
+                release_submission(event_id, submission_key)
+                messages.error(request, 'Registrations are very busy right now, please try again in a minute.')
+                return redirect('event_details', event_id=event_id)
+            complete_submission(event_id, submission_key, f'{RECEIPT_PREFIX}{receipt}')
+            return redirect('registration_receipt', receipt=receipt)
+
         if form.is_valid():
+            email = form.cleaned_data['email']
             try:
-                if not request.user.is_authenticated:
-                    first_name = request.POST.get('first_name')
-                    last_name = request.POST.get('last_name')
-                    email = request.POST.get('email')
-                    username = email
-
-                    try:
-                        user = User.objects.get(email=email)
-                    except User.DoesNotExist:
-                        # Create a new CustomUser with an unusable password
-                        user = User.objects.create(
-                            first_name = first_name,
-                            last_name = last_name,
-                            email = email,
-                            role = 'attendee',
-                            username = username,
-                        )
-                        user.set_unusable_password()
-                        user.save()
-                else:
-                    user = request.user
-                
-                registration = form.save_registration(user=user)
-                messages.success(request, f'Thank you!! You have successfully registered for {event.title}')
+                with transaction.atomic():
+                    if not request.user.is_authenticated:
+                        first_name = request.POST.get('first_name')
+                        last_name = request.POST.get('last_name')
+                        username = email
+
+                        try:
+                            user = User.objects.get(email=email)
+                        except User.DoesNotExist:
+                            # Create a new CustomUser with an unusable password
+                            user = User.objects.create(
+                                first_name = first_name,
+                                last_name = last_name,
+                                email = email,
+                                role = 'attendee',
+                                username = username,
+                            )
+                            user.set_unusable_password()
+                            user.save()
+                    else:
+                        user = request.user
+
+                    registration = form.save_registration(user=user)
+            except IntegrityError:
+                # Lost a race with another submission for the same email
+                remember_registered(event_id, email)
+                release_submission(event_id, submission_key)
+                messages.info(request, 'You are already registered for this event.')
                 return redirect('event_details', event_id=event_id)
             except Exception as e:
+                release_submission(event_id, submission_key)
                 messages.error(request, f'Registration failed: {str(e)}')
+            else:
+                remember_registered(event_id, email)
+                complete_submission(event_id, submission_key, registration.id)
+                messages.success(request, f'Thank you!! You have successfully registered for {event.title}. Your ticket code is {registration.ticket_code}')
+                return redirect('event_details', event_id=event_id)
         else:
+            release_submission(event_id, submission_key)
             messages.error(request, 'Please correct the errors below.')
     else:
         form = DynamicEventRegistrationForm(event)
     return render(request, 'event_details.html', {'form': form, 'event': event})
 
+def registration_form_data(event_id):
+    """The published event and its form fields, cached briefly for queued registration spikes"""
+    cache_key = f'registration_form:{event_id}'
+    data = cache.get(cache_key)
+    if data is None:
+        event = get_object_or_404(Event, id=event_id, status=Event.PUBLISHED)
+        data = (event, list(FormField.objects.filter(event=event).order_by('order')))
+        cache.set(cache_key, data, REGISTRATION_FORM_TTL)
+    return data
+
+def registration_receipt(request, receipt):
+    """Pending registration page, polls itself with ?format=json until the worker confirms"""
+    status = ingest.receipt_status(receipt) or {'status': 'unknown'}
+    if request.GET.get('format') == 'json':
+        return JsonResponse(status)
+    return render(request, 'registration_receipt.html', {'receipt': receipt, 'status': status})
+
 @login_required
 def create_event(request):
     if request.method == "POST":
@@ -103,7 +179,7 @@ def create_event(request):
             form.save_m2m()  # save tags/relations
 
             if event.status == Event.PENDING:
-                notify_admins(f'New event "{event.title}" awaiting approval', url=f'/admin/events/{event.id}/preview/')
+                send_admin_notification.enqueue(message=f'New event "{event.title}" awaiting approval', url=f'/admin/events/{event.id}/preview/')
 
             return redirect('event_budget', event_id=event.id)
             
@@ -112,14 +188,40 @@ def create_event(request):
 
     return render(request, "create_event.html", {"form": form})
 
-def view_event(request, event_id):
+@login_required
+def import_events_view(request):
+    errors = []
+    if request.method == 'POST':
+        form = EventImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            created, errors = import_events(form.cleaned_data['csv_file'], request.user)
+            if created:
+                messages.success(request, f'{created} events imported and sent for approval.')
+                return redirect('import_events')
+            if not errors:
+                messages.warning(request, 'The file has no events to import.')
+    else:
+        form = EventImportForm()
+
+    return render(request, 'import_events.html', {'form': form, 'errors': errors, 'columns': IMPORT_COLUMNS})
+
+async def view_event(request, event_id):
     """
     View function for displaying details of a single event.
     
-    Retrieves an event by its primary key (pk) and renders the event detail page.
+    Fetches the event with its organizer, the registration form fields and
+    the current user concurrently, then renders the event detail page.
     
     """
-    event = get_object_or_404(Event, id=event_id)
+    try:
+        event, form_fields, similar, request.user = await asyncio.gather(
+            Event.objects.select_related('organizer').aget(id=event_id),
+            alist(FormField.objects.filter(event_id=event_id).order_by('order')),
+            alist(similar_events(event_id)),
+            request.auser(),
+        )
+    except Event.DoesNotExist:
+        raise Http404('No Event matches the given query.')
     
     organizer = event.organizer
     organizer_name = event.organizer_name()  # This method already exists in your model
@@ -127,13 +229,14 @@ def view_event(request, event_id):
     organizer_email = organizer.email
 
     # user_contact = user.mobile_number
-    session_key = f'viewed_event_{event_id}'
-    if not request.session.get(session_key):
-        Event.objects.filter(id=event_id).update(views_count=F('views_count')+1)
-        event.refresh_from_db()
-        request.session[session_key] = True
+    if mark_event_viewed(request.session, event_id):
+        await asyncio.gather(
+            Event.objects.filter(id=event_id).aupdate(views_count=F('views_count')+1),
+            arecord_activity(event_id, 'view'),
+        )
+        event.views_count += 1
     
-    form = DynamicEventRegistrationForm(event)
+    form = DynamicEventRegistrationForm(event, form_fields=form_fields)
 
     context = {
         'event': event,
@@ -141,10 +244,12 @@ def view_event(request, event_id):
         'organizer_email': organizer_email,
         'organizer_contact': organizer_contact,
         'form': form,
+        'similar_events': [link.similar for link in similar],
     }
     return render(request, 'event_details.html', context)
 
 @login_required
+@read_replica
 def event_analytics(request, event_id):
     user = request.user
     event = get_object_or_404(Event, id=event_id)
@@ -178,8 +283,15 @@ def event_analytics(request, event_id):
 
     start_date = today - timedelta(days=days-1)
 
-    # List of registered attendees
+    # List of registered attendees, optionally those with one answer ('<field id>:<answer>')
     registered_users = registered_attendee
+    selected_answer = request.GET.get('answer', '')
+    if selected_answer:
+        field_id, _sep, value = selected_answer.partition(':')
+        try:
+            registered_users = answers.filter_by_answer(registered_users, event.id, int(field_id), value)
+        except ValueError:
+            registered_users = registered_users.none()
 
     # Group registrations count per date
     registrations_count = (
@@ -209,7 +321,10 @@ def event_analytics(request, event_id):
         'total_registrations': total_registrations,
         'conversion_rate': conversion_rate,
         'registered_users': registered_users,
+        'answer_filters': answers.filter_options(event.id),
+        'selected_answer': selected_answer,
         'registrations_over_time': chart_data,
+        'answer_charts': event_answer_charts(event),
         'reject': reject,
     }
 
@@ -253,7 +368,7 @@ def edit_event(request, event_id):
 
             # Notify attendees
             subject = f"Event Updated: {event.title}"
-            notify_event_attendees(event, subject, "event_updated")
+            email_event_attendees.enqueue(event_id=event.id, subject=subject, template_name="event_updated")
 
             messages.success(request, f"The event '{event.title}' was updated and attendees notified.")
             return redirect("event_details", event_id=event.id)
@@ -262,57 +377,168 @@ def edit_event(request, event_id):
 
     return render(request, "create_event.html", {"form": form, "event": event})
 
-def upcoming_events_view(request):
+@read_replica
+async def upcoming_events_view(request):
+    tag = slugify(request.GET.get('tag', ''))
     events = Event.objects.filter(start_date__gte=now(),status=Event.PUBLISHED).order_by('start_date')
-    paginator = Paginator(events, 8)  # Show 5 events per page
+    events = filter_by_tag(events, tag)
     page_number = request.GET.get('page')
-    events = paginator.get_page(page_number)
-    return render(request, 'upcoming_events.html', {'events': events})
+    events, tags, request.user = await asyncio.gather(
+        apaginate(events, 8, page_number),
+        alist(tag_facets()),
+        request.auser(),
+    )
+    return render(request, 'upcoming_events.html', {'events': events, 'tags': tags, 'active_tag': tag})
+
+
+@read_replica
+def browse_events(request):
+    '''Published events filtered by category, city, online and date, with facet counts'''
+    data = request.GET.copy()
+    if not data.get('date_from') and not data.get('date_to'):
+        data['date_from'] = timezone.now().date().isoformat()
+
+    events = Event.objects.filter(status=Event.PUBLISHED).order_by('start_date', 'id')
+    event_filter = EventFilter(data, queryset=events)
+    filters = event_filter.form.cleaned_data if event_filter.is_valid() else {}
+    facets = facet_counts(filters)
+
+    paginator = Paginator(event_filter.qs, 12)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'count': paginator.count,
+            'page': page_obj.number,
+            'num_pages': paginator.num_pages,
+            'results': [
+                {
+                    'id': event.id,
+                    'title': event.title,
+                    'category': event.category,
+                    'city': event.city,
+                    'is_online': event.is_online,
+                    'start_date': event.start_date.isoformat(),
+                    'url': reverse('event_details', args=[event.id]),
+                }
+                for event in page_obj
+            ],
+            'facets': facets,
+        })
+
+    query = data.copy()
+    query.pop('page', None)
+    context = {
+        'filter': event_filter,
+        'facets': facets,
+        'page_obj': page_obj,
+        'query_string': query.urlencode(),
+    }
+    return render(request, 'browse.html', context)
 
 
 CATEGORIES = ['venue', 'catering', 'decor', 'program']  # centralize categories
 
-@csrf_exempt
+def parse_budget_items(items_data):
+    """Build unsaved BudgetItems from JSON, raises ValueError on bad input"""
+    items = []
+    for item_data in items_data:
+        try:
+            amount = Decimal(str(item_data['amount']))
+        except (KeyError, TypeError, InvalidOperation):
+            raise ValueError(f'Invalid amount for item {item_data.get("name") or len(items) + 1}')
+        if not amount.is_finite() or amount < 0:
+            raise ValueError(f'Invalid amount for item {item_data.get("name") or len(items) + 1}')
+        items.append(BudgetItem(name=item_data.get('name'), category=item_data.get('category'), amount=amount))
+    return items
+
+def save_budget(event, data):
+    """Create or update the event budget and replace its line items in one transaction"""
+    items = parse_budget_items(data.get('items', []))
+    with transaction.atomic():
+        budget, _created = Budget.objects.select_for_update().get_or_create(event=event)
+        if 'notes' in data:
+            budget.notes = data['notes']
+        # The total is computed from the items, never taken from the client
+        budget.replace_items(items)
+    return budget
+
+def budget_summary(budget):
+    return {
+        'success': True,
+        'event_id': budget.event_id,
+        'total_amount': str(budget.total_amount),
+        'notes': budget.notes,
+        'items': [
+            {'id': item.id, 'name': item.name, 'category': item.category, 'amount': str(item.amount)}
+            for item in budget.items.all()
+        ],
+    }
+
+@login_required
 def event_budget_view(request, event_id):
-    event = get_object_or_404(Event, id=event_id)
+    event = get_object_or_404(Event, id=event_id, organizer=request.user)
     if request.method == 'POST':
-        data = json.loads(request.body)
-
-        budget = Budget.objects.create(event=event, total_amount=data['total_amount'], notes=data['notes'])
-        
-        # Create Items in a budget
-        for item_data in data['items']:
-            BudgetItem.objects.create(
-                budget=budget,
-                name=item_data['name'],
-                category=item_data['category'],
-                amount=item_data['amount']
-            )
+        try:
+            data = json.loads(request.body)
+            save_budget(event, data)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'message': str(e)}, status=400)
         return JsonResponse({'success': True, 'event_id': event.id})
 
     return render(request, 'budget.html', {'event': event,})
 
+@login_required
+def budget_items_api(request, event_id):
+    """GET the budget summary, PUT/POST {"items": [...], "notes": ...} to replace all line items"""
+    event = get_object_or_404(Event, id=event_id, organizer=request.user)
+
+    if request.method in ('PUT', 'POST'):
+        try:
+            data = json.loads(request.body)
+            budget = save_budget(event, data)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'message': str(e)}, status=400)
+        return JsonResponse(budget_summary(budget))
+
+    budget = Budget.objects.filter(event=event).first()
+    if budget is None:
+        return JsonResponse({'success': False, 'message': 'No budget for this event'}, status=404)
+    return JsonResponse(budget_summary(budget))
+
+@login_required
+def check_in_api(request, event_id):
+    """POST {"codes": [...]} with a batch of scanned ticket codes"""
+    event = get_object_or_404(Event, id=event_id)
+    if event.organizer_id != request.user.id and not is_admin(request.user):
+        return JsonResponse({'success': False, 'message': 'Not allowed'}, status=403)
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'POST a list of codes'}, status=405)
+
+    try:
+        codes = json.loads(request.body)['codes']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'message': 'Expected {"codes": [...]}'}, status=400)
+    if not isinstance(codes, list) or len(codes) > CHECK_IN_BATCH_LIMIT:
+        return JsonResponse({'success': False, 'message': f'Send up to {CHECK_IN_BATCH_LIMIT} codes per request'}, status=400)
+
+    return JsonResponse({'success': True, **check_in(event.id, codes)})
+
 def publish_event(request, event_id):
     event = get_object_or_404(Event, id=event_id)
 
     if request.method == 'POST':
         event.status = Event.PENDING
         event.save(update_fields=['status'])
-        notify_admins(f'New event "{event.title}" awaiting approval', url=f'/admin/events/{event.id}/preview/')
-        payload = {
+        send_admin_notification.enqueue(message=f'New event "{event.title}" awaiting approval', url=f'/admin/events/{event.id}/preview/')
+        post_admin_webhook.enqueue(payload={
             'event_id': event.id,
             'title': event.title,
             'organizer': event.organizer.username,
             'status': 'PUBLISHED'
-        }
+        })
+        messages.success(request, f"Event '{event.title}' published and sent for approval!")
 
-    try:
-        requests.post(settings.ADMIN_WEBHOOK_URL, json=payload, timeout=5)
-    except request.exceptions.RequestException as e:
-        messages.error(request, f'webhook failed: {e}. Contact system support.')
-        print('Webhook failed:', e)
-    
-    messages.success(request, f"Event '{event.title}' published and sent for approval!")
     return redirect('event_analytics', event_id=event.id)
 
 #@csrf_exempt
@@ -333,13 +559,9 @@ def publish_event(request, event_id):
 
 def search_events(request):
     query = request.GET.get('query', '')
-    print(query)
     events = Event.objects.filter(title=query.strip())
- 
-    print(f"about to print events: {events}")
-    for event in events:
-        print(event.title)
-    
+    logger.debug('Event search %r', query)
+
     return render(request,'upcoming_events.html', {'events': events})
 
 def event_summary_view(request, event_id):
@@ -395,3 +617,27 @@ def create_form_field(request, event_id):
             })
         
     return JsonResponse({'success': False, 'message': 'Invalid request'})
+
+
+@read_replica
+async def attendee_calendar_feed(request, token):
+    user_id = user_id_from_token(token)
+    if user_id is None:
+        raise Http404('Unknown calendar feed.')
+    return await feed_response(request, attendee_events(user_id), 'My registered events')
+
+
+@read_replica
+async def organizer_calendar_feed(request, user_id):
+    organizer = await User.objects.filter(id=user_id).only('first_name', 'last_name', 'username').afirst()
+    if organizer is None:
+        raise Http404('Unknown calendar feed.')
+    name = organizer.get_full_name() or organizer.username
+    return await feed_response(request, organizer_events(user_id), f'Events by {name}')
+
+
+@read_replica
+async def category_calendar_feed(request, category):
+    if category not in CATEGORY_LABELS:
+        raise Http404('Unknown calendar feed.')
+    return await feed_response(request, category_events(category), f'{CATEGORY_LABELS[category]} events')
@@ -0,0 +1,152 @@
+"""
+Facet counts for browsing published events.
+
+``EventFacetCount`` holds one row per (category, city, is_online, start_date)
+cell with the number of published events in it. Cells are recounted only
+when an event moves in or out of them (see ``Event.save``, and a
+post_delete receiver for every kind of delete), so facet counts for any
+filter combination are sums over this small table instead of an aggregate
+over events. Results are cached under a version key that is bumped
+whenever a cell changes.
+
+``QuerySet.update()`` skips all of that; callers refresh the cells with
+``refresh_facets_for_events`` (bulk moderation does). To repair anything
+that slipped through, run ``rebuild_facets`` periodically (e.g. nightly
+from cron), it also recounts the tags.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.db.models.signals import post_delete
+
+from .categories import CATEGORY_LABELS
+from .models import Event, EventFacetCount
+
+FACET_VERSION_KEY = 'event_facets:version'
+FACET_TTL = 300
+CITY_FACET_LIMIT = 20
+
+
+def bump_version():
+    try:
+        cache.incr(FACET_VERSION_KEY)
+    except ValueError:
+        cache.set(FACET_VERSION_KEY, 1, None)
+
+
+def refresh_facet_cells(cells):
+    """Recount the given cells from Event, ``None`` entries are ignored"""
+    cells = {cell for cell in cells if cell is not None}
+    if not cells:
+        return
+    for category, city, is_online, start_date in cells:
+        key = {'category': category, 'city': city, 'is_online': is_online, 'start_date': start_date}
+        count = Event.objects.filter(status=Event.PUBLISHED, **key).count()
+        if count:
+            EventFacetCount.objects.update_or_create(**key, defaults={'count': count})
+        else:
+            EventFacetCount.objects.filter(**key).delete()
+    bump_version()
+
+
+def refresh_facets_for_events(event_ids):
+    """Recount the cells of ``event_ids`` after a bulk status change"""
+    cells = set(
+        Event.objects.filter(id__in=event_ids)
+        .values_list('category', 'city', 'is_online', 'start_date')
+        .distinct()
+    )
+    refresh_facet_cells(cells)
+
+
+def _event_post_delete(sender, instance, **kwargs):
+    refresh_facet_cells([instance.facet_cell()])
+
+
+def install():
+    """Connect the receiver that keeps facet counts right when events are deleted"""
+    post_delete.connect(_event_post_delete, sender=Event, dispatch_uid='facets_event_post_delete')
+
+
+def rebuild_facets():
+    """Rebuild the whole table from Event, returns the number of cells"""
+    cells = (
+        Event.objects.filter(status=Event.PUBLISHED)
+        .values('category', 'city', 'is_online', 'start_date')
+        .annotate(count=Count('id'))
+    )
+    with transaction.atomic():
+        EventFacetCount.objects.all().delete()
+        created = EventFacetCount.objects.bulk_create(
+            (EventFacetCount(**cell) for cell in cells.iterator()), batch_size=1000
+        )
+    bump_version()
+    return len(created)
+
+
+def _cells(filters, exclude):
+    """Cells matching ``filters``, ignoring the filter on the ``exclude`` dimension"""
+    cells = EventFacetCount.objects.all()
+    if filters.get('category') and exclude != 'category':
+        cells = cells.filter(category=filters['category'])
+    if filters.get('city') and exclude != 'city':
+        cells = cells.filter(city__iexact=filters['city'])
+    if filters.get('is_online') is not None and exclude != 'is_online':
+        cells = cells.filter(is_online=filters['is_online'])
+    if exclude != 'month':
+        if filters.get('date_from'):
+            cells = cells.filter(start_date__gte=filters['date_from'])
+        if filters.get('date_to'):
+            cells = cells.filter(start_date__lte=filters['date_to'])
+    return cells
+
+
+def _compute_facets(filters):
+    categories = (
+        _cells(filters, 'category').values('category')
+        .annotate(total=Sum('count')).order_by('-total')
+    )
+    cities = (
+        _cells(filters, 'city').values('city')
+        .annotate(total=Sum('count')).order_by('-total')[:CITY_FACET_LIMIT]
+    )
+    online = _cells(filters, 'is_online').values('is_online').annotate(total=Sum('count'))
+    months = (
+        _cells(filters, 'month').annotate(month=TruncMonth('start_date'))
+        .values('month').annotate(total=Sum('count')).order_by('month')
+    )
+    return {
+        'category': [
+            {'value': row['category'], 'label': CATEGORY_LABELS.get(row['category'], row['category']), 'count': row['total']}
+            for row in categories
+        ],
+        'city': [{'value': row['city'], 'label': row['city'], 'count': row['total']} for row in cities],
+        'is_online': [
+            {'value': row['is_online'], 'label': 'Online' if row['is_online'] else 'In person', 'count': row['total']}
+            for row in online
+        ],
+        'month': [
+            {'value': row['month'].isoformat(), 'label': row['month'].strftime('%b %Y'), 'count': row['total']}
+            for row in months
+        ],
+    }
+
+
+def facet_counts(filters):
+    """
+    Facet counts per dimension for ``filters`` (category, city, is_online,
+    date_from, date_to). Each dimension ignores its own filter so the other
+    options stay visible.
+    """
+    version = cache.get_or_set(FACET_VERSION_KEY, 1, None)
+    signature = repr(sorted((key, str(value)) for key, value in filters.items() if value not in (None, '')))
+    key = f'event_facets:{version}:{hashlib.md5(signature.encode()).hexdigest()}'
+
+    facets = cache.get(key)
+    if facets is None:
+        facets = _compute_facets(filters)
+        cache.set(key, facets, FACET_TTL)
+    return facets
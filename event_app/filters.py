@@ -1,22 +1,25 @@
 import django_filters
 from django.contrib.auth import get_user_model
 from django import forms
+from django.db.models import Q
 from datetime import date
 
+from .models import Event
+from .user_search import search_users
+
 User = get_user_model()
 
 class UserFilter(django_filters.FilterSet):
-    email = django_filters.CharFilter(
-        field_name='email',
-        lookup_expr='icontains',
+    q = django_filters.CharFilter(
+        method='filter_search',
         widget=forms.TextInput(attrs={
             'class': 'form-control',
-            'placeholder': 'Search by email...'
+            'placeholder': 'Search by name, username or email...'
         }),
-        label='Email'
+        label='Search'
     )
-    registered_month = django_filters.DateFilter(
-        field_name = 'created_at',
+    registered_month = django_filters.NumberFilter(
+        field_name = 'date_joined',
         lookup_expr = 'month',
         widget = forms.Select(choices=[
             (1, 'January'), (2, 'February'), (3, 'March'), (4, 'April'), 
@@ -44,10 +47,97 @@ class UserFilter(django_filters.FilterSet):
     
     class Meta:
         model = User
-        fields = ['email','registered_month', 'role']
+        fields = ['q', 'registered_month', 'role']
+
+    def filter_search(self, queryset, name, value):
+        # Indexed prefix or ngram search, a plain icontains scans every user
+        return search_users(queryset, value)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        for field_name, field in self.form.fields.items():
+            field.widget.attrs.update({'class': 'form-control'})
+
+class EventFilter(django_filters.FilterSet):
+    category = django_filters.ChoiceFilter(
+        field_name='category',
+        choices=Event.CATEGORY_CHOICES,
+        empty_label='All Categories'
+    )
+    city = django_filters.CharFilter(
+        field_name='city',
+        lookup_expr='iexact',
+        widget=forms.TextInput(attrs={'placeholder': 'City'})
+    )
+    is_online = django_filters.BooleanFilter(field_name='is_online', label='Online')
+    date_from = django_filters.DateFilter(
+        field_name='start_date',
+        lookup_expr='gte',
+        widget=forms.DateInput(attrs={'type': 'date'})
+    )
+    date_to = django_filters.DateFilter(
+        field_name='start_date',
+        lookup_expr='lte',
+        widget=forms.DateInput(attrs={'type': 'date'})
+    )
+
+    class Meta:
+        model = Event
+        fields = ['category', 'city', 'is_online']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        for field_name, field in self.form.fields.items():
+            field.widget.attrs.update({'class': 'form-control'})
+
+
+class AdminEventFilter(django_filters.FilterSet):
+    STATUS_CHOICES = [
+        (Event.PENDING, 'Pending'),
+        (Event.PUBLISHED, 'Published'),
+        (Event.REJECTED, 'Rejected'),
+        (Event.CANCELLED, 'Cancelled'),
+    ]
+
+    status = django_filters.ChoiceFilter(
+        field_name='status',
+        choices=STATUS_CHOICES,
+        empty_label='All Statuses'
+    )
+    category = django_filters.ChoiceFilter(
+        field_name='category',
+        choices=Event.CATEGORY_CHOICES,
+        empty_label='All Categories'
+    )
+    date_from = django_filters.DateFilter(
+        field_name='start_date',
+        lookup_expr='gte',
+        widget=forms.DateInput(attrs={'type': 'date'})
+    )
+    date_to = django_filters.DateFilter(
+        field_name='start_date',
+        lookup_expr='lte',
+        widget=forms.DateInput(attrs={'type': 'date'})
+    )
+    organizer = django_filters.CharFilter(
+        method='filter_organizer',
+        widget=forms.TextInput(attrs={'placeholder': 'Organizer username or email'})
+    )
+
+    class Meta:
+        model = Event
+        fields = ['status', 'category', 'organizer']
+
+    def filter_organizer(self, queryset, name, value):
+        # Prefix matches can use the username/email indexes
+        return queryset.filter(
+            Q(organizer__username__istartswith=value) | Q(organizer__email__istartswith=value)
+        )
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
         for field_name, field in self.form.fields.items():
-            field.widget.attrs.update({'class': 'form-control'})
\ No newline at end of file
+            field.widget.attrs.update({'class': 'form-control form-control-sm'})
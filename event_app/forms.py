@@ -1,8 +1,13 @@
+import uuid
+
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm
 from django.contrib.auth import get_user_model
 
-from .models import Event, Budget, BudgetItem, FormField, EventRegistrations, RegistrationFieldValue
+from .models import Event, Budget, BudgetItem, EventRegistrations, RegistrationFieldValue
+from .trending import record_activity
+from .registrations import forget_attendee_overview
+from . import answer_stats, answers
 
 User = get_user_model()
 
@@ -151,6 +156,17 @@ class EventForm(forms.ModelForm):
 
         }
 
+class EventImportRowForm(EventForm):
+    '''EventForm validation for one CSV row, imported events are always pending'''
+    class Meta(EventForm.Meta):
+        fields = [field for field in EventForm.Meta.fields if field not in ('status', 'image')]
+
+class EventImportForm(forms.Form):
+    csv_file = forms.FileField(
+        label='CSV file',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,text/csv'}),
+    )
+
 class BudgetItemForm(forms.Form):
     class Meta:
         model = BudgetItem
@@ -168,18 +184,24 @@ class EventBudgetForm(forms.Form):
 class DynamicEventRegistrationForm(forms.Form):
     '''Dynamically generated form based on event's form fields '''
 
-    def __init__(self, event, *args, **kwargs):
+    def __init__(self, event, *args, form_fields=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.event = event
+        # Async views fetch the fields up front and pass them in
+        if form_fields is None:
+            form_fields = event.form_fields.all().order_by('order')
+        self.form_fields = list(form_fields)
 
         # Built in fields
         self.fields['email'] = forms.EmailField(label='Email Address', required=True, widget=forms.EmailInput(attrs={'class': 'form-control'}))
         self.fields['first_name'] = forms.CharField(label='First Name', required=True, widget=forms.TextInput(attrs={'class': 'form-control'}))
         self.fields['last_name'] = forms.CharField(label='Last Name', required=True, widget=forms.TextInput(attrs={'class': 'form-control'}))
         self.fields['username'] = forms.CharField(label='Username', required=True, widget=forms.TextInput(attrs={'class': 'form-control'}))
+        # Lets register_for_event recognise a double-submitted form
+        self.fields['idempotency_key'] = forms.CharField(required=False, widget=forms.HiddenInput, initial=uuid.uuid4().hex)
 
         # dynamic fields
-        for form_field in event.form_fields.all().order_by('order'):
+        for form_field in self.form_fields:
             field_name = f'field_{form_field.id}'
             django_field = self.create_django_field(form_field)
             self.fields[field_name] = django_field
@@ -258,29 +280,26 @@ class DynamicEventRegistrationForm(forms.Form):
         return forms.CharField(**field_kwargs)
     
     def save_registration(self, user=None):
-        """Save the registration and field values"""
-        # Create registration
-        registration = EventRegistrations.objects.create(
+        """Save the registration and its answers in the configured storage, see answers.py"""
+        values = {
+            int(field_name[len('field_'):]): value
+            for field_name, value in self.cleaned_data.items() if field_name.startswith('field_')
+        }
+        registration = EventRegistrations(
             event=self.event,
             user=user,
             email=self.cleaned_data['email'],
             first_name=self.cleaned_data['first_name'],
             last_name=self.cleaned_data['last_name']
         )
-        
-        # Save dynamic field values
-        for field_name, value in self.cleaned_data.items():
-            if field_name.startswith('field_'):
-                field_id = int(field_name.replace('field_', ''))
-                try:
-                    form_field = FormField.objects.get(id=field_id, event=self.event)
-                    field_value = RegistrationFieldValue.objects.create(
-                        registration=registration,
-                        form_field=form_field
-                    )
-                    field_value.set_value(value)
-                    field_value.save()
-                except FormField.DoesNotExist:
-                    continue
-        
+        if answers.writes_document():
+            answers.set_answers(registration, answers.get_schema(self.event.id, self.form_fields), values)
+        registration.save()
+
+        if answers.writes_rows():
+            RegistrationFieldValue.objects.bulk_create(answers.field_value_rows(registration, self.form_fields, values))
+
+        answer_stats.record_answers(self.form_fields, [values])
+        record_activity(self.event.id, 'registration')
+        forget_attendee_overview(registration.user_id)
         return registration
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""
+iCalendar (.ics) feeds.
+
+Calendar clients poll feeds often, so every request first computes a cheap
+validator (event count and latest ``updated_at``) with one aggregate query.
+A matching ``If-None-Match`` gets a 304, a cached body is returned as is,
+and only a changed feed is rendered, streamed from a chunked iterator and
+cached under its ETag as it goes out.
+"""
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.html import strip_tags
+
+from .models import Event
+
+FEED_STATUSES = (Event.PUBLISHED, Event.CANCELLED)
+FEED_TTL = 60 * 60
+CHUNK_SIZE = 500
+CONTENT_TYPE = 'text/calendar; charset=utf-8'
+TOKEN_SALT = 'event_app.ical'
+
+
+def feed_token(user):
+    """Signed token identifying ``user`` in their private feed URL"""
+    return signing.Signer(salt=TOKEN_SALT).sign(str(user.pk))
+
+
+def user_id_from_token(token):
+    try:
+        return int(signing.Signer(salt=TOKEN_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def attendee_events(user_id):
+    return Event.objects.filter(event_registrations__user_id=user_id, status__in=FEED_STATUSES).distinct()
+
+
+def organizer_events(user_id):
+    return Event.objects.filter(organizer_id=user_id, status__in=FEED_STATUSES)
+
+
+def category_events(category):
+    return Event.objects.filter(category=category, status__in=FEED_STATUSES)
+
+
+def _escape(text):
+    return (
+        str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """Fold a content line to 75 octets as RFC 5545 requires"""
+    parts, current, size = [], [], 0
+    for char in line:
+        width = len(char.encode())
+        if size + width > 75:
+            parts.append(''.join(current))
+            current, size = [' '], 1
+        current.append(char)
+        size += width
+    parts.append(''.join(current))
+    return '\r\n'.join(parts) + '\r\n'
+
+
+def _utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _vevent(event, host, base_url):
+    location = event.online_link if event.is_online and event.online_link else f'{event.venue}, {event.city}'
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:event-{event.pk}@{host}',
+        f'DTSTAMP:{_utc(event.updated_at)}',
+        f'LAST-MODIFIED:{_utc(event.updated_at)}',
+        f'DTSTART:{_utc(timezone.make_aware(datetime.combine(event.start_date, event.start_time)))}',
+        f'DTEND:{_utc(timezone.make_aware(datetime.combine(event.end_date, event.end_time)))}',
+        f'SUMMARY:{_escape(event.title)}',
+        f'DESCRIPTION:{_escape(strip_tags(event.description))}',
+        f'LOCATION:{_escape(location)}',
+        f'CATEGORIES:{_escape(event.get_category_display())}',
+        f'URL:{base_url}{reverse("event_details", args=[event.pk])}',
+        'STATUS:CANCELLED' if event.status == Event.CANCELLED else 'STATUS:CONFIRMED',
+        'END:VEVENT',
+    ]
+    return ''.join(_fold(line) for line in lines)
+
+
+async def _render(queryset, name, host, base_url):
+    yield ''.join(_fold(line) for line in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:-//{host}//Events//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(name)}',
+    ])
+    fields = (
+        'id', 'title', 'description', 'category', 'status', 'venue', 'city', 'is_online', 'online_link',
+        'start_date', 'end_date', 'start_time', 'end_time', 'updated_at',
+    )
+    async for event in queryset.only(*fields).order_by('start_date', 'id').aiterator(chunk_size=CHUNK_SIZE):
+        yield _vevent(event, host, base_url)
+    yield 'END:VCALENDAR\r\n'
+
+
+async def _stream_and_cache(cache_key, chunks):
+    parts = []
+    async for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    await cache.aset(cache_key, ''.join(parts), FEED_TTL)
+
+
+async def feed_response(request, queryset, name):
+    """Serve ``queryset`` as a calendar named ``name`` with ETag revalidation"""
+    stats = await queryset.order_by().aaggregate(count=Count('id', distinct=True), latest=Max('updated_at'))
+    signature = f'{request.path}:{stats["count"]}:{stats["latest"]}'
+    digest = hashlib.md5(signature.encode()).hexdigest()
+    etag = f'"{digest}"'
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        cache_key = f'ical:{digest}'
+        body = await cache.aget(cache_key)
+        if body is not None:
+            response = HttpResponse(body, content_type=CONTENT_TYPE)
+        else:
+            host = request.get_host()
+            chunks = _render(queryset, name, host.split(':')[0], f'{request.scheme}://{host}')
+            response = StreamingHttpResponse(_stream_and_cache(cache_key, chunks), content_type=CONTENT_TYPE)
+        response['Content-Disposition'] = 'inline; filename="events.ics"'
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=300'
+    return response
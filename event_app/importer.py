@@ -0,0 +1,96 @@
+"""
+Bulk event import from CSV.
+
+Every row is validated with ``EventImportRowForm`` (the ``EventForm`` rules)
+before anything is written. Valid imports are inserted with ``bulk_create``
+in batches as pending events, their tags linked in bulk, and admins get one
+summary notification per batch, queued as a background job instead of one per event.
+"""
+import csv
+import io
+
+from django.db import connection, transaction
+
+from .forms import EventImportRowForm
+from .log import get_logger
+from .models import Event
+from .tags import link_new_event_tags
+from .tasks import send_admin_notification
+
+logger = get_logger(__name__)
+
+BATCH_SIZE = 500
+MAX_ERRORS = 50
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'on'}
+COLUMNS = EventImportRowForm._meta.fields
+
+
+def read_rows(file):
+    """Yield ``(line_number, row)`` from an uploaded or opened CSV file"""
+    if isinstance(file, (io.TextIOBase, io.StringIO)):
+        text = file
+    else:
+        text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    for row in reader:
+        yield reader.line_num, {
+            (key or '').strip(): (value or '').strip() for key, value in row.items()
+        }
+
+
+def validate_rows(rows, organizer):
+    """Return ``(events, errors)``, errors are ``(line_number, message)`` pairs"""
+    events, errors = [], []
+    for line, row in rows:
+        # Checkbox widgets read any non-empty string as True
+        row['is_online'] = 'on' if row.get('is_online', '').lower() in TRUE_VALUES else ''
+        form = EventImportRowForm(data=row)
+        if not form.is_valid():
+            if len(errors) < MAX_ERRORS:
+                for field, messages in form.errors.items():
+                    errors.append((line, f'{field}: {" ".join(messages)}'))
+            continue
+        event = form.save(commit=False)
+        event.organizer = organizer
+        event.status = Event.PENDING
+        events.append(event)
+    return events, errors
+
+
+def _insert_batch(batch):
+    if connection.features.can_return_rows_from_bulk_insert:
+        return Event.objects.bulk_create(batch)
+
+    # MySQL does not return ids from a multi-row insert, read them back in
+    # insert order. Ids from one statement are increasing even if
+    # interleaved with other inserts, and only this organizer's new rows match.
+    last_id = Event.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    Event.objects.bulk_create(batch)
+    ids = (
+        Event.objects.filter(id__gt=last_id, organizer=batch[0].organizer, status=Event.PENDING)
+        .order_by('id').values_list('id', flat=True)[:len(batch)]
+    )
+    for event, event_id in zip(batch, ids):
+        event.pk = event_id
+    return batch
+
+
+def import_events(file, organizer):
+    """
+    Validate and import every row of ``file`` for ``organizer``. Nothing is
+    written if any row is invalid. Returns ``(created, errors)``.
+    """
+    events, errors = validate_rows(read_rows(file), organizer)
+    if errors:
+        return 0, errors
+
+    name = organizer.get_full_name() or organizer.username
+    with transaction.atomic():
+        for start in range(0, len(events), BATCH_SIZE):
+            batch = _insert_batch(events[start:start + BATCH_SIZE])
+            link_new_event_tags(batch)
+            message = f'{len(batch)} imported events from {name} awaiting approval'
+            send_admin_notification.enqueue(message=message, url='/events/?status=pending')
+
+    logger.info('Events imported', organizer=organizer.pk, events=len(events))
+    return len(events), []
@@ -0,0 +1,326 @@
+"""
+Queued registration ingest for ticket-drop spikes.
+
+With ``REGISTRATION_QUEUE_ENABLED`` the registration view validates the form,
+appends the submission to a local SQLite queue (durable on this host, no
+MySQL connection needed) and answers with a pending receipt. The
+``process_registrations`` worker drains the queue in batches: users and
+registrations are created with ``bulk_create`` over one DB connection, and
+each receipt's outcome is written to the cache where the receipt page polls
+for it. If MySQL is unavailable the batch stays queued and is retried, and
+when the queue grows past ``REGISTRATION_QUEUE_MAX`` new submissions are
+turned away instead of piling up.
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import InterfaceError, OperationalError, transaction
+
+from . import answer_stats, answers
+from .log import get_logger
+from .models import EventRegistrations, FormField, RegistrationFieldValue
+from .registrations import forget_attendee_overview, remember_registered
+from .trending import record_activity
+
+User = get_user_model()
+logger = get_logger(__name__)
+
+RECEIPT_TTL = 60 * 60
+MAX_ATTEMPTS = 5
+
+PENDING = 'pending'
+CONFIRMED = 'confirmed'
+FAILED = 'failed'
+
+
+class QueueFull(Exception):
+    pass
+
+
+_unshared_cache_logged = False
+
+
+def is_enabled():
+    """
+    Queued ingest needs a cache shared by the web processes and the worker,
+    the receipts are only ever written there. Refuses with a per-process one.
+    """
+    global _unshared_cache_logged
+    if not getattr(settings, 'REGISTRATION_QUEUE_ENABLED', False):
+        return False
+    if isinstance(caches['default'], (LocMemCache, DummyCache)):
+        if not _unshared_cache_logged:
+            logger.error('REGISTRATION_QUEUE_ENABLED needs a shared cache (REDIS_URL), registering synchronously')
+            _unshared_cache_logged = True
+        return False
+    return True
+
+
+class RegistrationQueue:
+    """Append-only SQLite queue of registration submissions, one connection per thread"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.local = threading.local()
+
+    @property
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS submissions ('
+                'id INTEGER PRIMARY KEY, receipt TEXT UNIQUE, payload TEXT, attempts INTEGER DEFAULT 0)'
+            )
+            self.local.connection = connection
+        return connection
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM submissions').fetchone()[0]
+
+    def put(self, payload):
+        if len(self) >= getattr(settings, 'REGISTRATION_QUEUE_MAX', 10000):
+            raise QueueFull
+        receipt = uuid.uuid4().hex
+        self.connection.execute(
+            'INSERT INTO submissions (receipt, payload) VALUES (?, ?)',
+            (receipt, json.dumps(payload, cls=DjangoJSONEncoder)),
+        )
+        return receipt
+
+    def peek(self, limit):
+        rows = self.connection.execute(
+            'SELECT id, receipt, payload, attempts FROM submissions ORDER BY id LIMIT ?', (limit,)
+        ).fetchall()
+        return [(row_id, receipt, json.loads(payload), attempts) for row_id, receipt, payload, attempts in rows]
+
+    def ack(self, row_ids):
+        self.connection.executemany('DELETE FROM submissions WHERE id = ?', [(row_id,) for row_id in row_ids])
+
+    def retry(self, row_ids):
+        self.connection.executemany(
+            'UPDATE submissions SET attempts = attempts + 1 WHERE id = ?', [(row_id,) for row_id in row_ids]
+        )
+
+
+_queue = None
+
+
+def get_queue():
+    global _queue
+    if _queue is None:
+        _queue = RegistrationQueue(settings.REGISTRATION_QUEUE_PATH)
+    return _queue
+
+
+def _receipt_key(receipt):
+    return f'registration_receipt:{receipt}'
+
+
+def receipt_status(receipt):
+    return cache.get(_receipt_key(receipt))
+
+
+def _set_receipt(receipt, status, **extra):
+    cache.set(_receipt_key(receipt), {'status': status, **extra}, RECEIPT_TTL)
+
+
+def enqueue_registration(form, user=None):
+    """Queue a validated DynamicEventRegistrationForm, returns the receipt id"""
+    data = form.cleaned_data
+    payload = {
+        'event_id': form.event.id,
+        'user_id': user.id if user is not None else None,
+        'email': data['email'],
+        'first_name': data['first_name'],
+        'last_name': data['last_name'],
+        'fields': {name[len('field_'):]: value for name, value in data.items() if name.startswith('field_')},
+    }
+    receipt = get_queue().put(payload)
+    _set_receipt(receipt, PENDING, event_id=form.event.id)
+    return receipt
+
+
+def _resolve_users(entries):
+    """Map email to user id for anonymous submissions, creating missing attendees in bulk"""
+    emails = {entry['email'] for entry in entries if entry['user_id'] is None}
+    if not emails:
+        return {}
+    users = dict(User.objects.filter(email__in=emails).values_list('email', 'id'))
+    missing = []
+    for entry in entries:
+        if entry['user_id'] is None and entry['email'] not in users:
+            user = User(
+                email=entry['email'], username=entry['email'], role='attendee',
+                first_name=entry['first_name'], last_name=entry['last_name'],
+            )
+            user.set_unusable_password()
+            missing.append(user)
+            users[entry['email']] = None
+    if missing:
+        User.objects.bulk_create(missing, ignore_conflicts=True)
+        users.update(User.objects.filter(email__in=[user.email for user in missing]).values_list('email', 'id'))
+    return users
+
+
+def process_batch(batch_size=200):
+    """Register one batch from the queue, returns the number of submissions handled"""
+    queue = get_queue()
+    rows = queue.peek(batch_size)
+    if not rows:
+        return 0
+
+    try:
+        return _process_rows(queue, rows)
+    except (OperationalError, InterfaceError):
+        # The DB is unavailable, keep the whole batch for later
+        logger.exception('Registration batch failed, will retry', submissions=len(rows))
+        _retry_or_fail(queue, rows)
+        return 0
+    except Exception:
+        if len(rows) == 1:
+            logger.exception('Registration submission failed, will retry', receipt=rows[0][1])
+            _retry_or_fail(queue, rows)
+            return 0
+        # Most likely one bad submission (e.g. an email colliding with an
+        # existing user), go one by one so only that one fails
+        logger.exception('Registration batch failed, retrying submissions one by one', submissions=len(rows))
+
+    handled = 0
+    for row in rows:
+        try:
+            handled += _process_rows(queue, [row])
+        except Exception:
+            logger.exception('Registration submission failed, will retry', receipt=row[1])
+            _retry_or_fail(queue, [row])
+    return handled
+
+
+def _process_rows(queue, rows):
+    with transaction.atomic():
+        results = _register(rows)
+
+    for _row_id, receipt, payload, _attempts in rows:
+        if results[receipt]['status'] != FAILED:
+            remember_registered(payload['event_id'], payload['email'])
+        _set_receipt(receipt, **results[receipt])
+    queue.ack([row[0] for row in rows])
+    logger.info('Registration batch processed', submissions=len(rows))
+    return len(rows)
+
+
+def _retry_or_fail(queue, rows):
+    exhausted, retry = [], []
+    for row_id, receipt, _payload, attempts in rows:
+        if attempts + 1 >= MAX_ATTEMPTS:
+            _set_receipt(receipt, FAILED, message='Registration could not be completed, please try again.')
+            exhausted.append(row_id)
+        else:
+            retry.append(row_id)
+    queue.ack(exhausted)
+    queue.retry(retry)
+
+
+def _register(rows):
+    entries = {receipt: payload for _row_id, receipt, payload, _attempts in rows}
+    users = _resolve_users(entries.values())
+    results = {}
+
+    # Keep the first submission per (event, email), the rest are duplicates
+    wanted = {}
+    for receipt, entry in entries.items():
+        wanted.setdefault((entry['event_id'], entry['email']), receipt)
+    existing = set(
+        EventRegistrations.objects.filter(
+            event_id__in={event_id for event_id, _email in wanted},
+            email__in={email for _event_id, email in wanted},
+        ).values_list('event_id', 'email')
+    )
+
+    form_fields = defaultdict(list)
+    for form_field in FormField.objects.filter(event_id__in={event_id for event_id, _email in wanted}).order_by('order', 'id'):
+        form_fields[form_field.event_id].append(form_field)
+    schemas = {}
+
+    new, values, rejected = [], {}, {}
+    for (event_id, email), receipt in wanted.items():
+        if (event_id, email) in existing:
+            continue
+        entry = entries[receipt]
+        registration = EventRegistrations(
+            event_id=event_id,
+            user_id=entry['user_id'] or users.get(email),
+            email=email,
+            first_name=entry['first_name'],
+            last_name=entry['last_name'],
+        )
+        values[(event_id, email)] = {int(field_id): value for field_id, value in entry['fields'].items()}
+        if answers.writes_document():
+            if event_id not in schemas:
+                schemas[event_id] = answers.get_schema(event_id, form_fields[event_id])
+            try:
+                answers.set_answers(registration, schemas[event_id], values[(event_id, email)])
+            except ValidationError as e:
+                # The form changed after this submission was queued
+                rejected[(event_id, email)] = ' '.join(e.messages)
+                continue
+        new.append(registration)
+    EventRegistrations.objects.bulk_create(new)
+
+    registrations = {
+        (registration.event_id, registration.email): registration
+        for registration in EventRegistrations.objects.filter(
+            event_id__in={event_id for event_id, _email in wanted},
+            email__in={email for _event_id, email in wanted},
+        ).only('id', 'event_id', 'email', 'answers', 'form_version')
+    }
+
+    field_values = []
+    new_answers = defaultdict(list)
+    for registration in new:
+        key = (registration.event_id, registration.email)
+        new_answers[registration.event_id].append(values[key])
+        if answers.writes_rows():
+            field_values.extend(answers.field_value_rows(registrations[key], form_fields[registration.event_id], values[key]))
+    RegistrationFieldValue.objects.bulk_create(field_values)
+    for event_id, event_answers in new_answers.items():
+        answer_stats.record_answers(form_fields[event_id], event_answers)
+        record_activity(event_id, 'registration', len(event_answers))
+    forget_attendee_overview(*{registration.user_id for registration in new})
+
+    for receipt, entry in entries.items():
+        key = (entry['event_id'], entry['email'])
+        if key in rejected:
+            results[receipt] = {'status': FAILED, 'event_id': entry['event_id'], 'message': rejected[key]}
+        elif wanted[key] == receipt and key not in existing:
+            results[receipt] = {'status': CONFIRMED, 'event_id': entry['event_id'], 'ticket_code': registrations[key].ticket_code}
+        else:
+            results[receipt] = {'status': CONFIRMED, 'event_id': entry['event_id'], 'duplicate': True}
+    return results
+
+
+def run_worker(batch_size=200, idle_sleep=0.5, once=False):
+    backoff = idle_sleep
+    while True:
+        handled = process_batch(batch_size)
+        if once and not handled:
+            return
+        if handled:
+            backoff = idle_sleep
+        else:
+            time.sleep(backoff)
+            # Back off while idle or while the DB is failing
+            backoff = min(backoff * 2, 10)
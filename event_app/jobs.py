@@ -0,0 +1,223 @@
+"""
+Database-backed background jobs.
+
+Slow side effects (email, webhooks, notification fan-out) are functions
+registered with ``@task`` and queued with ``some_task.enqueue(**kwargs)``.
+The job row is inserted in the caller's transaction, so it only becomes
+visible once the data it refers to is committed and no broker is needed.
+``run_workers`` threads claim due jobs highest priority first with
+``SELECT ... FOR UPDATE SKIP LOCKED``, so any number of threads and processes
+can poll the same table without blocking each other. Failures are retried
+with exponential backoff up to ``max_attempts``; every row keeps its
+attempts, last error, queue wait and run time for ``job_stats``.
+"""
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Avg, Count, ExpressionWrapper, DurationField, F, Max
+from django.utils import timezone
+
+from .log import get_logger
+from .models import Job
+
+logger = get_logger(__name__)
+
+TASKS = {}
+
+RETRY_BASE_SECONDS = 10
+RETRY_MAX_SECONDS = 60 * 60
+# Running jobs not finished after this long belong to a dead worker
+STALE_AFTER = timedelta(minutes=15)
+RETENTION = timedelta(days=7)
+PURGE_BATCH_SIZE = 1000
+MAX_ERROR_LENGTH = 4000
+
+
+class Task:
+    def __init__(self, func, name, priority, max_attempts):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def _job(self, kwargs, run_at, delay, priority):
+        if run_at is None:
+            run_at = timezone.now() + (delay or timedelta())
+        return Job(
+            task=self.name, kwargs=kwargs, run_at=run_at, max_attempts=self.max_attempts,
+            priority=self.priority if priority is None else priority,
+        )
+
+    def enqueue(self, *, run_at=None, delay=None, priority=None, **kwargs):
+        """Queue a call with JSON-serialisable ``kwargs``, optionally at ``run_at`` or after ``delay``"""
+        job = self._job(kwargs, run_at, delay, priority)
+        job.save()
+        return job
+
+    async def aenqueue(self, *, run_at=None, delay=None, priority=None, **kwargs):
+        job = self._job(kwargs, run_at, delay, priority)
+        await job.asave()
+        return job
+
+
+def task(name=None, priority=0, max_attempts=5):
+    """Register the decorated function as a job task"""
+    def register(func):
+        registered = Task(func, name or f'{func.__module__}.{func.__name__}', priority, max_attempts)
+        TASKS[registered.name] = registered
+        return registered
+    return register
+
+
+def worker_name(index=0):
+    return f'{socket.gethostname()}:{os.getpid()}:{index}'
+
+
+def claim(worker, limit):
+    """Lock up to ``limit`` due jobs for ``worker`` and mark them running"""
+    now = timezone.now()
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    with transaction.atomic():
+        ids = list(
+            Job.objects.select_for_update(skip_locked=skip_locked)
+            .filter(status=Job.QUEUED, run_at__lte=now)
+            .order_by('-priority', 'run_at', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        claimed = Job.objects.filter(id__in=ids, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=worker, locked_at=now, started_at=now, attempts=F('attempts') + 1,
+        )
+    jobs = Job.objects.filter(id__in=ids)
+    if claimed < len(ids):
+        # Without row locks (SQLite) another worker can take some of them first
+        jobs = jobs.filter(status=Job.RUNNING, locked_by=worker, locked_at=now)
+    return list(jobs.order_by('-priority', 'run_at', 'id'))
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS))
+
+
+def run_job(job):
+    """Run one claimed job and record its outcome, returns True on success"""
+    started = time.monotonic()
+    error = None
+    try:
+        registered = TASKS.get(job.task)
+        if registered is None:
+            raise LookupError(f'Unknown task "{job.task}"')
+        registered.func(**job.kwargs)
+    except Exception:
+        error = traceback.format_exc()[-MAX_ERROR_LENGTH:]
+
+    now = timezone.now()
+    duration_ms = int((time.monotonic() - started) * 1000)
+    wait_ms = int((job.started_at - job.run_at).total_seconds() * 1000)
+    fields = {'duration_ms': duration_ms, 'locked_by': '', 'locked_at': None}
+    if error is None:
+        fields.update(status=Job.SUCCEEDED, finished_at=now)
+        logger.info('Job succeeded', job=job.id, task=job.task, attempt=job.attempts, wait_ms=wait_ms, duration_ms=duration_ms)
+    elif job.attempts < job.max_attempts:
+        fields.update(status=Job.QUEUED, run_at=now + retry_delay(job.attempts), started_at=None, last_error=error)
+        logger.warning('Job failed, will retry', job=job.id, task=job.task, attempt=job.attempts, error=error.splitlines()[-1])
+    else:
+        fields.update(status=Job.FAILED, finished_at=now, last_error=error)
+        logger.error('Job failed', job=job.id, task=job.task, attempt=job.attempts, error=error.splitlines()[-1])
+    Job.objects.filter(id=job.id).update(**fields)
+    return error is None
+
+
+def requeue_stale():
+    """Give jobs held by a dead worker back to the queue, or fail them if out of attempts"""
+    cutoff = timezone.now() - STALE_AFTER
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished_at=timezone.now(), last_error='Worker stopped while running the job',
+    )
+    requeued = stale.update(status=Job.QUEUED, locked_by='', locked_at=None, started_at=None)
+    if failed or requeued:
+        logger.warning('Stale jobs recovered', requeued=requeued, failed=failed)
+    return requeued, failed
+
+
+def purge_finished():
+    """Delete one batch of succeeded jobs older than ``RETENTION``"""
+    ids = list(
+        Job.objects.filter(status=Job.SUCCEEDED, finished_at__lt=timezone.now() - RETENTION)
+        .values_list('id', flat=True)[:PURGE_BATCH_SIZE]
+    )
+    return Job.objects.filter(id__in=ids).delete()[0] if ids else 0
+
+
+def work(worker, stop, batch_size=10, poll_interval=1.0, once=False):
+    """Claim and run jobs until ``stop`` is set, or the queue is empty with ``once``"""
+    try:
+        while not stop.is_set():
+            try:
+                jobs = claim(worker, batch_size)
+            except Exception:
+                logger.exception('Claiming jobs failed', worker=worker)
+                jobs = None
+            for job in jobs or ():
+                run_job(job)
+            # Hand the connection back between batches like a request would
+            close_old_connections()
+            if not jobs:
+                if once and jobs is not None:
+                    return
+                stop.wait(poll_interval)
+    finally:
+        connection.close()
+
+
+def run_threads(threads, batch_size=10, poll_interval=1.0, once=False, stop=None, housekeeping_interval=60):
+    """Run ``threads`` worker threads in this process until ``stop`` is set or, with ``once``, the queue drains"""
+    stop = stop or threading.Event()
+    workers = [
+        threading.Thread(
+            target=work, args=(worker_name(index), stop, batch_size, poll_interval, once),
+            name=f'job-worker-{index}', daemon=True,
+        )
+        for index in range(threads)
+    ]
+    for thread in workers:
+        thread.start()
+
+    next_housekeeping = 0
+    while any(thread.is_alive() for thread in workers) and not stop.is_set():
+        if time.monotonic() >= next_housekeeping:
+            try:
+                requeue_stale()
+                purge_finished()
+            except Exception:
+                logger.exception('Job housekeeping failed')
+            finally:
+                connection.close()
+            next_housekeeping = time.monotonic() + housekeeping_interval
+        stop.wait(poll_interval)
+    for thread in workers:
+        thread.join()
+
+
+def stats(since=None):
+    """Per-task job counts by status with average queue wait and run time"""
+    jobs = Job.objects.all()
+    if since is not None:
+        jobs = jobs.filter(created_at__gte=since)
+    wait = ExpressionWrapper(F('started_at') - F('run_at'), output_field=DurationField())
+    rows = (
+        jobs.values('task', 'status')
+        .annotate(jobs=Count('id'), avg_wait=Avg(wait), avg_ms=Avg('duration_ms'), max_ms=Max('duration_ms'))
+        .order_by('task', 'status')
+    )
+    return list(rows)
@@ -0,0 +1,103 @@
+"""
+Structured, sampled logging for event_app.
+
+Usage::
+
+    from .log import get_logger
+    logger = get_logger(__name__)
+    logger.debug('Search for %r', query, results=count)
+
+Messages use lazy %-formatting and keyword arguments become structured
+fields on the record. Nothing is formatted (and no sampling dice are rolled)
+when the level is disabled. Records go through a bounded queue to a
+listener thread so request threads never block on I/O.
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+
+from django.conf import settings
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    '''Logger adapter taking structured fields as keyword arguments'''
+
+    def __init__(self, logger, sample_rate=1.0):
+        super().__init__(logger, {})
+        self.sample_rate = sample_rate
+
+    def _emit(self, level, msg, args, fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        # Only chatty levels are sampled, warnings and errors always go out
+        if level < logging.WARNING and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        exc_info = fields.pop('exc_info', None)
+        # stacklevel=3 skips _emit() and the level method so records point at the caller
+        self.logger.log(level, msg, *args, exc_info=exc_info, extra={'fields': fields}, stacklevel=3)
+
+    def debug(self, msg, *args, **fields):
+        self._emit(logging.DEBUG, msg, args, fields)
+
+    def info(self, msg, *args, **fields):
+        self._emit(logging.INFO, msg, args, fields)
+
+    def warning(self, msg, *args, **fields):
+        self._emit(logging.WARNING, msg, args, fields)
+
+    def error(self, msg, *args, **fields):
+        self._emit(logging.ERROR, msg, args, fields)
+
+    def exception(self, msg, *args, **fields):
+        fields.setdefault('exc_info', True)
+        self._emit(logging.ERROR, msg, args, fields)
+
+
+def get_logger(name):
+    """Return a StructuredLogger using the sample rate configured for ``name``"""
+    rates = getattr(settings, 'EVENT_APP_LOG_SAMPLING', {})
+    return StructuredLogger(logging.getLogger(name), rates.get(name, 1.0))
+
+
+class StructuredFormatter(logging.Formatter):
+    """Append structured fields to the formatted message as key=value pairs"""
+
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value!r}' for key, value in fields.items())
+        return line
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue records for a background listener that writes them to ``stream``.
+
+    The queue is bounded, when it is full records are dropped (and counted)
+    instead of blocking the request thread.
+    """
+
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.listener = logging.handlers.QueueListener(self.queue, self.target, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def setFormatter(self, fmt):
+        # Formatting happens on the listener thread, not at enqueue time
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
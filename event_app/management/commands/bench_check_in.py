@@ -0,0 +1,69 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from event_app import checkin
+from event_app.models import Event, EventRegistrations
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Measure ticket scans per second for an event, verifying codes alone and through the check-in endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', type=int)
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument(
+            '--reset', action='store_true',
+            help="Clear the event's check-ins first so every scan is recorded (changes data!)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            event = Event.objects.select_related('organizer').get(id=options['event_id'])
+        except Event.DoesNotExist:
+            raise CommandError('Unknown event')
+
+        registrations = EventRegistrations.objects.filter(event=event)
+        if options['reset']:
+            registrations.update(checked_in_at=None)
+            checkin._check_in_sets.pop(event.id, None)
+
+        codes = [
+            checkin.ticket_code(registration)
+            for registration in registrations.only('id', 'event_id').order_by('id').iterator()
+        ]
+        if not codes:
+            raise CommandError('The event has no registrations')
+
+        start = time.perf_counter()
+        valid = sum(1 for code in codes if checkin.verify_ticket(code, event.id) is not None)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'{"verify only":>16}: {len(codes) / elapsed:10.0f} scans/s ({valid} valid)')
+
+        client = Client()
+        client.force_login(event.organizer)
+        batch_size = options['batch_size']
+        totals = {'checked_in': 0, 'duplicate': 0, 'invalid': 0}
+        # Scan everything twice, the second pass is all duplicates
+        scans = codes + codes
+        start = time.perf_counter()
+        for offset in range(0, len(scans), batch_size):
+            response = client.post(
+                f'/api/event/{event.id}/check-in/',
+                data=json.dumps({'codes': scans[offset:offset + batch_size]}),
+                content_type='application/json',
+            )
+            result = response.json()
+            totals['checked_in'] += result['checked_in']
+            totals['duplicate'] += result['duplicate']
+            totals['invalid'] += len(result['invalid'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'{"endpoint":>16}: {len(scans) / elapsed:10.0f} scans/s in batches of {batch_size}, '
+            f'{totals["checked_in"]} checked in, {totals["duplicate"]} duplicates, {totals["invalid"]} invalid'
+        )
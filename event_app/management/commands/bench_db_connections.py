@@ -0,0 +1,101 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from event_app import db_metrics
+from event_app.db_backends.pool import drain_pool
+
+
+def _close_all_connections():
+    for conn in connections.all():
+        conn.close()
+
+
+class Command(BaseCommand):
+    help = 'Measure requests per second through the ASGI handler with per-request, persistent and pooled DB connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/', help='URL path to request')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument('--max-age', type=int, default=60, help='CONN_MAX_AGE used for the persistent run')
+        parser.add_argument('--pool-size', type=int, default=10, help='POOL_SIZE used for the pooled run')
+
+    def handle(self, *args, **options):
+        app = ASGIHandler()
+        runs = [
+            ('per-request connections', 0, 0),
+            ('persistent connections', options['max_age'], 0),
+            ('pooled connections', 0, options['pool_size']),
+        ]
+
+        for label, max_age, pool_size in runs:
+            for alias in connections:
+                connections.settings[alias]['CONN_MAX_AGE'] = max_age
+                connections.settings[alias]['POOL_SIZE'] = pool_size
+                drain_pool(alias)
+
+            elapsed, statuses = asyncio.run(
+                self.run_requests(app, options['path'], options['requests'], options['concurrency'])
+            )
+            stats = db_metrics.snapshot()
+            opened = sum(stats['opened'].values())
+            errors = sum(1 for status in statuses if status != 200)
+
+            self.stdout.write(
+                f'{label:>24}: {len(statuses) / elapsed:8.1f} req/s, '
+                f'{opened} connections opened ({stats["connections_per_request"]} per request), '
+                f'{errors} non-200 responses'
+            )
+
+    async def run_requests(self, app, path, total, concurrency):
+        # Connections live on the executor thread, close them there
+        await sync_to_async(_close_all_connections)()
+        db_metrics.reset()
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited():
+            async with semaphore:
+                return await self.request(app, path)
+
+        start = time.perf_counter()
+        statuses = await asyncio.gather(*(limited() for _ in range(total)))
+        return time.perf_counter() - start, statuses
+
+    async def request(self, app, path):
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': [(b'host', b'localhost')],
+            'client': ('127.0.0.1', 0),
+            'server': ('localhost', 80),
+        }
+        body_sent = False
+        response = {}
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # Never disconnect, the handler cancels this once it has responded
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+
+        await app(scope, receive, send)
+        return response.get('status')
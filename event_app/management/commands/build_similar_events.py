@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from event_app.similar import build_similar_events, refresh_similar_since
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the similar events index, or refresh it from recent registrations and favorites'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since-minutes', type=int,
+            help='Only refresh events affected by interactions in the last N minutes',
+        )
+
+    def handle(self, *args, **options):
+        if options['since_minutes']:
+            since = timezone.now() - timedelta(minutes=options['since_minutes'])
+            rows = refresh_similar_since(since)
+        else:
+            rows = build_similar_events()
+        self.stdout.write(self.style.SUCCESS(f'Wrote {rows} similar event rows'))
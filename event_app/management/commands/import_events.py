@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from event_app.importer import import_events
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Import events from a CSV file as pending events of an organizer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path')
+        parser.add_argument('--organizer', required=True, help='Username of the organizer')
+
+    def handle(self, *args, **options):
+        try:
+            organizer = User.objects.get(username=options['organizer'])
+        except User.DoesNotExist:
+            raise CommandError(f'Unknown organizer "{options["organizer"]}"')
+
+        with open(options['csv_path'], newline='', encoding='utf-8-sig') as file:
+            created, errors = import_events(file, organizer)
+
+        for line, message in errors:
+            self.stderr.write(f'Line {line}: {message}')
+        if errors:
+            raise CommandError('Nothing was imported')
+        self.stdout.write(self.style.SUCCESS(f'Imported {created} events'))
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from event_app import jobs
+
+
+class Command(BaseCommand):
+    help = 'Show background job counts, queue wait and run time per task'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Only jobs created in the last N hours')
+
+    def handle(self, *args, **options):
+        rows = jobs.stats(since=timezone.now() - timedelta(hours=options['hours']))
+        if not rows:
+            self.stdout.write('No jobs')
+            return
+        self.stdout.write(f'{"task":<45} {"status":<10} {"jobs":>7} {"avg wait":>10} {"avg ms":>8} {"max ms":>8}')
+        for row in rows:
+            wait = f'{row["avg_wait"].total_seconds():.1f}s' if row['avg_wait'] is not None else '-'
+            avg_ms = f'{row["avg_ms"]:.0f}' if row['avg_ms'] is not None else '-'
+            max_ms = row['max_ms'] if row['max_ms'] is not None else '-'
+            self.stdout.write(f'{row["task"]:<45} {row["status"]:<10} {row["jobs"]:>7} {wait:>10} {avg_ms:>8} {max_ms:>8}')
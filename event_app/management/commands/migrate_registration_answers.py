@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from event_app.answers import migrate_registrations
+
+
+class Command(BaseCommand):
+    help = 'Copy registration answers from RegistrationFieldValue rows into the JSON answers document'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        converted = migrate_registrations(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Converted {converted} registrations'))
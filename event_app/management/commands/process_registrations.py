@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from event_app.ingest import run_worker
+
+
+class Command(BaseCommand):
+    help = 'Drain the queued registration ingest into the database in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+
+    def handle(self, *args, **options):
+        run_worker(batch_size=options['batch_size'], once=options['once'])
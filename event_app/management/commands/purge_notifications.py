@@ -0,0 +1,29 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from event_app.models import Notification
+
+
+class Command(BaseCommand):
+    help = 'Delete read notifications older than --days in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.1, help='Seconds to sleep between batches')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        old = Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+        deleted = 0
+        while True:
+            # Delete by primary key so each statement locks a bounded set of rows
+            ids = list(old.values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            deleted += Notification.objects.filter(id__in=ids).delete()[0]
+            time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} read notifications older than {options["days"]} days'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from event_app.answer_stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Recount the registration form answer statistics from scratch, '
+        'run it after changing the choices or number bounds of a form field'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int, action='append', dest='events', help='Only this event, repeatable')
+
+    def handle(self, *args, **options):
+        buckets = rebuild_stats(options['events'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {buckets} answer buckets'))
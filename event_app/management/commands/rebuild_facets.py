@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from event_app.facets import rebuild_facets
+from event_app.tags import refresh_tag_counts
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the published event facet and tag counts from scratch, '
+        'run periodically (e.g. nightly from cron) to repair bulk updates that skipped Event.save'
+    )
+
+    def handle(self, *args, **options):
+        cells = rebuild_facets()
+        refresh_tag_counts()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {cells} facet cells and the tag counts'))
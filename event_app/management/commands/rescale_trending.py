@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from event_app.trending import rescale
+
+
+class Command(BaseCommand):
+    help = 'Rescale trending scores to the current time, run periodically (e.g. weekly from cron)'
+
+    def handle(self, *args, **options):
+        factor, removed = rescale()
+        self.stdout.write(self.style.SUCCESS(f'Scores scaled by {factor:.6g}, {removed} stale scores removed'))
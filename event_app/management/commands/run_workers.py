@@ -0,0 +1,69 @@
+import multiprocessing
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from event_app import jobs, tasks  # noqa: F401, registers the tasks
+from event_app.db_backends.pool import drain_pool
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs from the job table with a pool of worker processes and threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--threads', type=int, default=4, help='Worker threads per process')
+        parser.add_argument('--batch-size', type=int, default=10, help='Jobs claimed per query')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when no job is due')
+        parser.add_argument('--once', action='store_true', help='Exit when no job is due')
+
+    def handle(self, *args, **options):
+        if options['processes'] < 1 or options['threads'] < 1:
+            raise CommandError('--processes and --threads must be at least 1')
+        worker_options = {
+            'threads': options['threads'],
+            'batch_size': options['batch_size'],
+            'poll_interval': options['poll_interval'],
+            'once': options['once'],
+        }
+
+        if options['processes'] == 1:
+            run_process(**worker_options)
+        else:
+            if 'fork' not in multiprocessing.get_all_start_methods():
+                raise CommandError('--processes needs a platform with fork, use --threads instead')
+            # Children must open their own connections, not share the parent's sockets
+            connections.close_all()
+            for alias in settings.DATABASES:
+                drain_pool(alias)
+            context = multiprocessing.get_context('fork')
+            processes = [
+                context.Process(target=run_process, kwargs=worker_options, name=f'job-process-{index}')
+                for index in range(options['processes'])
+            ]
+            for process in processes:
+                process.start()
+
+            def stop_children(*_args):
+                # Each child finishes its running jobs on SIGTERM
+                for process in processes:
+                    if process.is_alive():
+                        process.terminate()
+
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, stop_children)
+            for process in processes:
+                process.join()
+
+        self.stdout.write(self.style.SUCCESS('Job workers stopped'))
+
+
+def run_process(threads, **options):
+    """Run worker threads until SIGTERM or SIGINT, letting running jobs finish"""
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_args: stop.set())
+    jobs.run_threads(threads, stop=stop, **options)
@@ -0,0 +1,108 @@
+import math
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+
+from . import ratelimit, routers
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+PIN_COOKIE = 'db_pin'
+
+
+class ReplicaPinMiddleware:
+    """
+    Set up per-request routing state and pin a browser to the primary
+    database for a short while after it writes, see routers.py.
+    """
+    sync_capable = True
+    async_capable = True
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = routers.begin_request(pinned=PIN_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.end_request()
+        return self.pin_if_wrote(request, response, state)
+
+    async def __acall__(self, request):
+        state = routers.begin_request(pinned=PIN_COOKIE in request.COOKIES)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.end_request()
+        return self.pin_if_wrote(request, response, state)
+
+    def pin_if_wrote(self, request, response, state):
+        # Writes from GETs (e.g. view counters) are not user edits
+        if state['wrote'] and request.method not in self.SAFE_METHODS:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICA_STICKY_SECONDS', 10),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class RateLimitMiddleware:
+    """
+    Token-bucket limits per URL name from ``settings.RATE_LIMITS``, see
+    ratelimit.py. Runs in ``process_view`` where the URL name is known, and
+    answers 429 with Retry-After before the view or any DB work.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.policies = ratelimit.load_policies()
+        self.buckets = ratelimit.get_buckets()
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # The handler adapts process_view to the request mode, an async
+            # one avoids a thread hop on every async request
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        policy = self.policies.get(request.resolver_match.url_name)
+        if policy is None or request.method not in policy[0]:
+            return None
+        return self.check(request, policy[1], view_kwargs)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        policy = self.policies.get(request.resolver_match.url_name)
+        if policy is None or request.method not in policy[0]:
+            return None
+        return self.check(request, policy[1], view_kwargs)
+
+    def check(self, request, limits, view_kwargs):
+        url_name = request.resolver_match.url_name
+        for key, capacity, refill in limits:
+            if key == 'ip':
+                bucket = f'{url_name}:ip:{request.META.get("REMOTE_ADDR", "")}'
+            else:
+                bucket = f'{url_name}:event:{view_kwargs.get("event_id")}'
+            wait = self.buckets.take(bucket, capacity, refill)
+            if wait:
+                logger.warning('Rate limited', route=url_name, key=key, ip=request.META.get('REMOTE_ADDR'))
+                response = HttpResponse('Too many requests, please try again shortly.', status=429, content_type='text/plain')
+                response['Retry-After'] = str(math.ceil(wait))
+                return response
+        return None
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def backfill_tags(apps, schema_editor):
+    Event = apps.get_model('event_app', 'Event')
+    Tag = apps.get_model('event_app', 'Tag')
+    EventTag = apps.get_model('event_app', 'EventTag')
+
+    names = {}
+    event_slugs = []
+    for event_id, status, text in Event.objects.values_list('id', 'status', 'tags').iterator(chunk_size=2000):
+        slugs = set()
+        for name in (text or '').split(','):
+            name = name.strip()[:50]
+            slug = slugify(name)[:60]
+            if slug:
+                names.setdefault(slug, name)
+                slugs.add(slug)
+        event_slugs.append((event_id, status, slugs))
+
+    Tag.objects.bulk_create([Tag(slug=slug, name=name) for slug, name in names.items()], batch_size=1000)
+    tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+
+    links = []
+    published_counts = {}
+    for event_id, status, slugs in event_slugs:
+        for slug in slugs:
+            links.append(EventTag(event_id=event_id, tag_id=tag_ids[slug]))
+            if status == 'published':
+                published_counts[slug] = published_counts.get(slug, 0) + 1
+    EventTag.objects.bulk_create(links, batch_size=1000)
+
+    tags = list(Tag.objects.filter(slug__in=published_counts))
+    for tag in tags:
+        tag.published_count = published_counts[tag.slug]
+    Tag.objects.bulk_update(tags, ['published_count'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_app', '0015_budget_notes_budgetitem_category'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('slug', models.SlugField(max_length=60, unique=True)),
+                ('published_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EventTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='event_tags', to='event_app.event')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='event_tags', to='event_app.tag')),
+            ],
+            options={
+                'unique_together': {('tag', 'event')},
+            },
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='tag_set',
+            field=models.ManyToManyField(blank=True, related_name='events', through='event_app.EventTag', to='event_app.tag'),
+        ),
+        migrations.RunPython(backfill_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:46
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_facet_counts(apps, schema_editor):
+    Event = apps.get_model('event_app', 'Event')
+    EventFacetCount = apps.get_model('event_app', 'EventFacetCount')
+
+    cells = (
+        Event.objects.filter(status='published')
+        .values('category', 'city', 'is_online', 'start_date')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    EventFacetCount.objects.bulk_create((EventFacetCount(**cell) for cell in cells.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_app', '0016_tag_eventtag_event_tag_set'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=80)),
+                ('city', models.CharField(max_length=100)),
+                ('is_online', models.BooleanField()),
+                ('start_date', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['status', 'category', 'city', 'is_online', 'start_date'], name='event_facet_cell_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventfacetcount',
+            index=models.Index(fields=['start_date'], name='event_app_e_start_d_e94fb3_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='eventfacetcount',
+            unique_together={('category', 'city', 'is_online', 'start_date')},
+        ),
+        migrations.RunPython(backfill_facet_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+
+
+def seed_trending(apps, schema_editor):
+    # Existing activity has no usable timestamps, count it all as of now
+    Event = apps.get_model('event_app', 'Event')
+    EventTrend = apps.get_model('event_app', 'EventTrend')
+    TrendingEpoch = apps.get_model('event_app', 'TrendingEpoch')
+
+    TrendingEpoch.objects.create(pk=1, started_at=timezone.now())
+    events = (
+        Event.objects.annotate(
+            registration_total=Count('event_registrations', distinct=True),
+            favorite_total=Count('favorites', distinct=True),
+        )
+        .values_list('id', 'views_count', 'registration_total', 'favorite_total')
+        .order_by()
+    )
+    EventTrend.objects.bulk_create(
+        (
+            EventTrend(event_id=event_id, score=views + 5 * registrations + 3 * favorites)
+            for event_id, views, registrations, favorites in events.iterator()
+            if views or registrations or favorites
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_app', '0017_eventfacetcount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventTrend',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trend', serialize=False, to='event_app.event')),
+                ('score', models.FloatField(db_index=True, default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrendingEpoch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.RunPython(seed_trending, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_app', '0018_eventtrend_trendingepoch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_links', to='event_app.event')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='event_app.event')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['event', '-score'], name='similar_event_lookup_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_app', '0019_similarevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventregistrations',
+            name='checked_in_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:09
+
+from django.db import migrations, models
+
+NGRAM_INDEX = 'user_search_ngram_idx'
+
+
+def create_ngram_index(apps, schema_editor):
+    # Substring search on MySQL, other backends fall back to LIKE
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    table = schema_editor.quote_name(apps.get_model('event_app', 'CustomUser')._meta.db_table)
+    schema_editor.execute(
+        f'CREATE FULLTEXT INDEX {NGRAM_INDEX} ON {table} (username, email, first_name, last_name) WITH PARSER ngram'
+    )
+
+
+def drop_ngram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    table = schema_editor.quote_name(apps.get_model('event_app', 'CustomUser')._meta.db_table)
+    schema_editor.execute(f'DROP INDEX {NGRAM_INDEX} ON {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('event_app', '0022_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['email'], name='user_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['first_name'], name='user_first_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['last_name'], name='user_last_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['role'], name='user_role_idx'),
+        ),
+        migrations.RunPython(create_ngram_index, drop_ngram_index),
+    ]
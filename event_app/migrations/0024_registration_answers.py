@@ -0,0 +1,72 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:11
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.db.models.fields.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_app', '0023_user_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistrationFormSchema',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('digest', models.CharField(max_length=32)),
+                ('fields', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='eventregistrations',
+            name='answers',
+            field=models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder),
+        ),
+        migrations.AddField(
+            model_name='eventregistrations',
+            name='form_version',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='registrationformschema',
+            name='event',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='form_schemas', to='event_app.event'),
+        ),
+        migrations.AddField(
+            model_name='eventregistrations',
+            name='answer_filter_1',
+            field=models.GeneratedField(db_persist=False, expression=django.db.models.fields.json.KeyTextTransform('0', django.db.models.fields.json.KeyTextTransform('filters', 'answers')), output_field=models.CharField(max_length=255)),
+        ),
+        migrations.AddField(
+            model_name='eventregistrations',
+            name='answer_filter_2',
+            field=models.GeneratedField(db_persist=False, expression=django.db.models.fields.json.KeyTextTransform('1', django.db.models.fields.json.KeyTextTransform('filters', 'answers')), output_field=models.CharField(max_length=255)),
+        ),
+        migrations.AddField(
+            model_name='eventregistrations',
+            name='answer_filter_3',
+            field=models.GeneratedField(db_persist=False, expression=django.db.models.fields.json.KeyTextTransform('2', django.db.models.fields.json.KeyTextTransform('filters', 'answers')), output_field=models.CharField(max_length=255)),
+        ),
+        migrations.AddIndex(
+            model_name='eventregistrations',
+            index=models.Index(fields=['event', 'answer_filter_1'], name='registration_answer_1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventregistrations',
+            index=models.Index(fields=['event', 'answer_filter_2'], name='registration_answer_2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventregistrations',
+            index=models.Index(fields=['event', 'answer_filter_3'], name='registration_answer_3_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='registrationformschema',
+            unique_together={('event', 'digest'), ('event', 'version')},
+        ),
+    ]
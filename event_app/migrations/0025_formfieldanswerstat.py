@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_app', '0024_registration_answers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FormFieldAnswerStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(max_length=255)),
+                ('sort_key', models.FloatField(default=0)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('form_field', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answer_stats', to='event_app.formfield')),
+            ],
+            options={
+                'unique_together': {('form_field', 'bucket')},
+            },
+        ),
+    ]
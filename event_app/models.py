@@ -1,10 +1,16 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete
+from django.db.models.fields.json import KT
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from decimal import Decimal
 import json
 
+from .categories import CATEGORY_CHOICES, get_category
+
 # Create your models here.
 class CustomUser(AbstractUser):
     ROLE_CHOICES = [
@@ -16,6 +22,16 @@ class CustomUser(AbstractUser):
     contact_number = models.CharField(max_length=15, blank=True, null=True)
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='organizer')
 
+    class Meta(AbstractUser.Meta):
+        # Prefix search in the admin users list, see event_app/user_search.py.
+        # username is already indexed by its unique constraint.
+        indexes = [
+            models.Index(fields=['email'], name='user_email_idx'),
+            models.Index(fields=['first_name'], name='user_first_name_idx'),
+            models.Index(fields=['last_name'], name='user_last_name_idx'),
+            models.Index(fields=['role'], name='user_role_idx'),
+        ]
+
     def __str__(self):
         return f'{self.username} ({self.role})'
 
@@ -35,19 +51,7 @@ class Event(models.Model):
     GOVERNMENT = 'government'
     TOURISM = 'tourism'
 
-    CATEGORY_CHOICES = [
-        (MUSIC_ARTS, 'Music & Arts'),
-        (BUSINESS, 'Business & Professional'),
-        (SPORTS, 'Sports & Fitness'),
-        (TECHNOLOGY, 'Technology'),
-        (FOOD_DRINK, 'Food & Drink'),
-        (HEALTH_WELLNESS, 'Health & Wellness'),
-        (EDUCATION, 'Education & Learning'),
-        (COMMUNITY, 'Community & Culture'),
-        (CHARITY, 'Charity & Fundraising'),
-        (GOVERNMENT, 'Government & Politics'),
-        (TOURISM, 'Tourism & Hospitality'),
-    ]
+    CATEGORY_CHOICES = CATEGORY_CHOICES
 
     DRAFT = 'draft'
     PUBLISHED = 'published'
@@ -88,6 +92,8 @@ class Event(models.Model):
 
     image = models.ImageField(upload_to='event_images/', blank=True, null=True)
     tags = models.TextField(help_text='Comma-separated tags', blank=True)
+    # Normalized copy of `tags`, kept in sync on save (see tags.py)
+    tag_set = models.ManyToManyField('Tag', through='EventTag', related_name='events', blank=True)
 
     max_attendees = models.PositiveIntegerField(blank=True, null=True)
     registration_deadline = models.DateTimeField(blank=True, null=True)
@@ -98,10 +104,41 @@ class Event(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Recounting a facet cell is a single index range scan
+            models.Index(fields=['status', 'category', 'city', 'is_online', 'start_date'], name='event_facet_cell_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember which facet cell the event counted in when loaded
+        instance._loaded_facet_cell = instance.facet_cell()
+        return instance
+
+    def facet_cell(self):
+        '''(category, city, is_online, start_date) for published events, else None'''
+        fields = ('status', 'category', 'city', 'is_online', 'start_date')
+        if self.get_deferred_fields() & set(fields) or self.status != self.PUBLISHED:
+            return None
+        return (self.category, self.city, self.is_online, self.start_date)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from .facets import refresh_facet_cells
+        from .tags import sync_event_tags
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'tags', 'status'} & set(update_fields):
+            sync_event_tags(self)
+
+        old_cell, new_cell = getattr(self, '_loaded_facet_cell', None), self.facet_cell()
+        if old_cell != new_cell:
+            refresh_facet_cells([old_cell, new_cell])
+        self._loaded_facet_cell = new_cell
     
     def organizer_name(self):
         return f'{self.organizer.first_name} {self.organizer.last_name}'
@@ -119,6 +156,9 @@ class Event(models.Model):
 
     @property
     def tags_list(self):
+        # Use prefetched normalized tags when available
+        if 'tag_set' in getattr(self, '_prefetched_objects_cache', {}):
+            return [tag.name for tag in self.tag_set.all()]
         return [tag.strip() for tag in self.tags.split(',') if tag.strip()]
 
     def is_attendee_registered(self, attendee):
@@ -132,20 +172,75 @@ class Event(models.Model):
         return True, 'Can register'
     
     def get_category_display_info(self):
-        category_info = {
-            self.MUSIC_ARTS: {"label": "Music & Arts", "color": "bg-purple-100 text-purple-800"},
-            self.BUSINESS: {"label": "Business & Professional", "color": "#87ceeb"},
-            self.SPORTS: {"label": "Sports & Fitness", "color": "bg-green-100 text-green-800"},
-            self.TECHNOLOGY: {"label": "Technology", "color": "bg-gray-100 text-gray-800"},
-            self.FOOD_DRINK: {"label": "Food & Drink", "color": "bg-orange-100 text-orange-800"},
-            self.HEALTH_WELLNESS: {"label": "Health & Wellness", "color": "bg-emerald-100 text-emerald-800"},
-            self.EDUCATION: {"label": "Education & Learning", "color": "bg-yellow-100 text-yellow-800"},
-            self.COMMUNITY: {"label": "Community & Culture", "color": "bg-pink-100 text-pink-800"},
-            self.CHARITY: {"label": "Charity & Fundraising", "color": "bg-red-100 text-red-800"},
-            self.GOVERNMENT: {"label": "Government & Politics", "color": "bg-indigo-100 text-indigo-800"},
-            self.TOURISM: {"label": "Tourism & Hospitality", "color": "bg-teal-100 text-teal-800"},
-        }
-        return category_info.get(self.category, {'label': self.get_category_display(), 'color': 'bg-secondary text-white'})
+        return get_category(self.category).display_info
+
+class Tag(models.Model):
+    name = models.CharField(max_length=50)
+    slug = models.SlugField(max_length=60, unique=True)
+    # Number of published events with this tag, maintained by tags.py
+    published_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+class EventTag(models.Model):
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='event_tags')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='event_tags')
+
+    class Meta:
+        # Leading on tag so filtering events by tag is an index lookup
+        unique_together = ['tag', 'event']
+
+    def __str__(self):
+        return f'{self.event} #{self.tag}'
+
+class EventFacetCount(models.Model):
+    '''Published event counts per (category, city, is_online, start_date), see facets.py'''
+    category = models.CharField(max_length=80)
+    city = models.CharField(max_length=100)
+    is_online = models.BooleanField()
+    start_date = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['category', 'city', 'is_online', 'start_date']
+        indexes = [models.Index(fields=['start_date'])]
+
+    def __str__(self):
+        return f'{self.category}/{self.city}/{self.start_date}: {self.count}'
+
+class EventTrend(models.Model):
+    '''Decayed activity score per event, maintained incrementally by trending.py'''
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, primary_key=True, related_name='trend')
+    score = models.FloatField(default=0, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.event_id}: {self.score:.2f}'
+
+class SimilarEvent(models.Model):
+    '''Top-K most similar events per event, rebuilt by similar.py'''
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='similar_links')
+    similar = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['event', '-score'], name='similar_event_lookup_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.event_id} -> {self.similar_id} ({self.score:.3f})'
+
+class TrendingEpoch(models.Model):
+    '''Single row holding the time trending scores are currently scaled to'''
+    started_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'Trending epoch {self.started_at}'
 
 class EventRegistration(models.Model):
     """
@@ -207,8 +302,20 @@ class EventFavorite(models.Model):
 
     def __str__(self):
         return f'{self.attendee} favorited "{self.event}" on {self.favorited_at}'
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if adding:
+            from .trending import record_activity
+            record_activity(self.event_id, 'favorite')
     
 
+def budget_amount(value):
+    '''``value`` as the Decimal an amount column stores, without binary float noise'''
+    return Decimal(str(value)).quantize(Decimal('0.01'))
+
+
 class Budget(models.Model):
     event = models.OneToOneField(Event, on_delete=models.CASCADE, related_name='budget')
     total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
@@ -217,10 +324,27 @@ class Budget(models.Model):
     update_at = models.DateTimeField(auto_now=True)
 
     def calculate_total(self):
+        '''Re-aggregate the total from scratch, only needed to repair drift'''
         total = self.items.aggregate(total=models.Sum('amount'))['total'] or 0
         self.total_amount = total
         self.save()
         return total
+
+    def replace_items(self, items):
+        '''Replace every line item with ``items`` (unsaved BudgetItems) in one transaction'''
+        with transaction.atomic():
+            self.items.all().delete()
+            for item in items:
+                item.budget = self
+            BudgetItem.objects.bulk_create(items)
+            self.total_amount = sum((budget_amount(item.amount) for item in items), Decimal('0.00'))
+            self.save()
+        return items
+
+    @staticmethod
+    def add_to_total(budget_id, delta):
+        if delta:
+            Budget.objects.filter(pk=budget_id).update(total_amount=models.F('total_amount') + delta)
     
     def __str__(self):
         return f"Budget for {self.event.title} - {self.total_amount}"
@@ -236,6 +360,39 @@ class BudgetItem(models.Model):
 
     def __str__(self):
         return  f"{self.category}: {self.amount}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What this item currently contributes to its budget's total
+        instance._counted = (instance.budget_id, instance.amount) if 'amount' in field_names else None
+        return instance
+
+    def save(self, *args, **kwargs):
+        '''Save and apply the change in amount to the budget total by delta'''
+        update_fields = kwargs.get('update_fields')
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if update_fields is not None and not {'amount', 'budget', 'budget_id'} & set(update_fields):
+                return
+            old = getattr(self, '_counted', None)
+            new_amount = budget_amount(self.amount)
+            if old and old[0] == self.budget_id:
+                Budget.add_to_total(self.budget_id, new_amount - old[1])
+            else:
+                if old:
+                    Budget.add_to_total(old[0], -old[1])
+                Budget.add_to_total(self.budget_id, new_amount)
+        self._counted = (self.budget_id, new_amount)
+
+
+def _budget_item_deleted(sender, instance, **kwargs):
+    # Receiver rather than a delete() override, so queryset, admin and cascade deletes count too
+    budget_id, amount = getattr(instance, '_counted', None) or (instance.budget_id, budget_amount(instance.amount))
+    Budget.add_to_total(budget_id, -amount)
+
+
+post_delete.connect(_budget_item_deleted, sender=BudgetItem, dispatch_uid='budget_item_deleted')
     
 class Notification(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
@@ -244,9 +401,52 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'is_read'], name='notification_user_read_idx'),
+        ]
+
     def __str__(self):
         return f'Notification for {self.user.username}: {self.message}'
     
+class Job(models.Model):
+    """Deferred side effect run by the ``run_workers`` command, see event_app/jobs.py"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    task = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    # Higher runs first
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration_ms = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at'], name='job_dequeue_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.task} #{self.pk} ({self.status})'
+
 class Rejection(models.Model):
     admin = models.ForeignKey(User, on_delete=models.CASCADE, related_name='rejection')
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='event')
@@ -325,6 +525,34 @@ class FormField(models.Model):
     class Meta:
         ordering = ['order', 'id']
 
+class RegistrationFormSchema(models.Model):
+    '''Immutable snapshot of an event's form fields that registration answers are validated against'''
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='form_schemas')
+    version = models.PositiveIntegerField()
+    digest = models.CharField(max_length=32)
+    fields = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = [('event', 'version'), ('event', 'digest')]
+
+    def __str__(self):
+        return f'{self.event_id} form v{self.version}'
+
+class FormFieldAnswerStat(models.Model):
+    '''Registrations per answer bucket of a FormField, see event_app/answer_stats.py'''
+    form_field = models.ForeignKey(FormField, on_delete=models.CASCADE, related_name='answer_stats')
+    bucket = models.CharField(max_length=255)
+    # Order of numeric histogram buckets
+    sort_key = models.FloatField(default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['form_field', 'bucket']
+
+    def __str__(self):
+        return f'{self.form_field_id} {self.bucket}: {self.count}'
+
 class EventRegistrations(models.Model):
     '''User registration for event'''
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='event_registrations')
@@ -334,15 +562,42 @@ class EventRegistrations(models.Model):
 
     first_name = models.CharField(max_length=100, blank=True)
     last_name = models.CharField(max_length=100, blank=True)
-    
+    checked_in_at = models.DateTimeField(blank=True, null=True)
+
+    # Answers as one document validated against form_version of the event's
+    # RegistrationFormSchema, see event_app/answers.py. NULL form_version
+    # means the answers are still in RegistrationFieldValue rows.
+    answers = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    form_version = models.PositiveIntegerField(null=True, blank=True)
+    # Filterable answers (select, radio, yes/no) get one of these slots
+    answer_filter_1 = models.GeneratedField(
+        expression=KT('answers__filters__0'), output_field=models.CharField(max_length=255), db_persist=False,
+    )
+    answer_filter_2 = models.GeneratedField(
+        expression=KT('answers__filters__1'), output_field=models.CharField(max_length=255), db_persist=False,
+    )
+    answer_filter_3 = models.GeneratedField(
+        expression=KT('answers__filters__2'), output_field=models.CharField(max_length=255), db_persist=False,
+    )
+
     def __str__(self):
         if self.user:
             return f"{self.user.get_full_name()} - {self.event.title}"
         return f"{self.first_name} {self.last_name} - {self.event.title}"
 
+    @property
+    def ticket_code(self):
+        from .checkin import ticket_code
+        return ticket_code(self)
+
     class Meta:
         unique_together = ['event', 'email']  # Prevent duplicate registrations
         ordering = ['-registered_at']
+        indexes = [
+            models.Index(fields=['event', 'answer_filter_1'], name='registration_answer_1_idx'),
+            models.Index(fields=['event', 'answer_filter_2'], name='registration_answer_2_idx'),
+            models.Index(fields=['event', 'answer_filter_3'], name='registration_answer_3_idx'),
+        ]
     
 class RegistrationFieldValue(models.Model):
     """Store dynamic field values for each registration"""
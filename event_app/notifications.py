@@ -0,0 +1,74 @@
+"""
+Notification inbox helpers.
+
+Each user's unread count is cached and kept current by delta: incremented
+when notifications are created (``push_notifications``) and decremented by
+the rows a mark-as-read UPDATE touched. A missing key is recounted from the
+``(user, is_read)`` index on the next read; the TTL bounds any drift from
+races between a recount and a delta.
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+
+from .models import Notification
+
+UNREAD_TTL = 60 * 60
+INBOX_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def _unread_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def unread_count(user_id):
+    count = cache.get(_unread_key(user_id))
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        cache.set(_unread_key(user_id), count, UNREAD_TTL)
+    return count
+
+
+def adjust_unread(user_id, delta):
+    """Apply ``delta`` to a cached count, returns the new count or None if it was not cached"""
+    try:
+        return cache.incr(_unread_key(user_id), delta)
+    except ValueError:
+        return None
+
+
+def push_unread_count(user_id, count):
+    async_to_sync(get_channel_layer().group_send)(
+        f'user_{user_id}', {'type': 'unread_count', 'unread_count': count}
+    )
+
+
+def inbox_page(user_id, before=None, limit=INBOX_PAGE_SIZE, unread_only=False):
+    """
+    One page of a user's notifications, newest first, using keyset pagination
+    on the id. Returns the rows and the cursor for the next page (or None).
+    """
+    notifications = Notification.objects.filter(user_id=user_id)
+    if unread_only:
+        notifications = notifications.filter(is_read=False)
+    if before is not None:
+        notifications = notifications.filter(id__lt=before)
+    rows = list(notifications.order_by('-id').values('id', 'message', 'url', 'is_read', 'created_at')[:limit + 1])
+    next_before = rows[limit - 1]['id'] if len(rows) > limit else None
+    return rows[:limit], next_before
+
+
+def mark_read(user_id, ids=None):
+    """Mark ``ids`` (all if None) read with one UPDATE, returns the new unread count"""
+    notifications = Notification.objects.filter(user_id=user_id, is_read=False)
+    if ids is not None:
+        notifications = notifications.filter(id__in=ids)
+    updated = notifications.update(is_read=True)
+
+    count = adjust_unread(user_id, -updated) if updated else None
+    if count is None or count < 0:
+        cache.delete(_unread_key(user_id))
+        count = unread_count(user_id)
+    push_unread_count(user_id, count)
+    return count
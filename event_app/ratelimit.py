@@ -0,0 +1,101 @@
+"""
+Token-bucket rate limits for unauthenticated endpoints.
+
+``settings.RATE_LIMITS`` maps URL names to the methods they apply to and a
+list of ``(key, rate)`` limits, where key is ``'ip'`` (client address) or
+``'event'`` (the ``event_id`` URL argument, shared by all clients) and rate
+is like ``'10/m'``: a bucket of 10 tokens refilled at 10 per minute.
+
+Buckets live in process memory by default, which keeps the check in the
+low microseconds. Set ``RATE_LIMIT_CACHE`` to a cache alias to share them
+between workers; updates there are read-modify-write, so concurrent
+requests can overshoot a limit slightly.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+KEY_TYPES = ('ip', 'event')
+
+
+def parse_rate(rate):
+    """``'10/m'`` -> ``(capacity, tokens per second)``"""
+    count, period = rate.split('/')
+    count = int(count)
+    return count, count / PERIODS[period]
+
+
+def load_policies():
+    """Compile ``settings.RATE_LIMITS`` into ``{url_name: (methods, [(key, capacity, refill)])}``"""
+    policies = {}
+    for url_name, policy in getattr(settings, 'RATE_LIMITS', {}).items():
+        limits = []
+        for key, rate in policy['limits']:
+            if key not in KEY_TYPES:
+                raise ValueError(f'Unknown rate limit key "{key}" for {url_name}')
+            limits.append((key, *parse_rate(rate)))
+        methods = frozenset(method.upper() for method in policy.get('methods', ('POST',)))
+        policies[url_name] = (methods, limits)
+    return policies
+
+
+class LocalBuckets:
+    """Buckets in this process, idle ones are pruned once ``MAX_KEYS`` is reached"""
+    MAX_KEYS = 100_000
+    # Long enough for any per-hour bucket to have refilled
+    MAX_IDLE = 60 * 60
+
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, refill):
+        """Take one token, return 0 if allowed or the seconds until one is available"""
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            tokens = capacity if bucket is None else min(capacity, bucket[0] + (now - bucket[1]) * refill)
+            if tokens < 1:
+                self.buckets[key] = (tokens, now)
+                return (1 - tokens) / refill
+            if bucket is None and len(self.buckets) >= self.MAX_KEYS:
+                self._prune(now)
+            self.buckets[key] = (tokens - 1, now)
+            return 0
+
+    def _prune(self, now):
+        # A bucket that has refilled completely is the same as no bucket
+        self.buckets = {
+            key: (tokens, stamp) for key, (tokens, stamp) in self.buckets.items()
+            if now - stamp < self.MAX_IDLE
+        }
+        if len(self.buckets) >= self.MAX_KEYS:
+            # Flooded with distinct clients, start over rather than grow
+            self.buckets = {}
+
+
+class CacheBuckets:
+    """Buckets in a shared Django cache"""
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def take(self, key, capacity, refill):
+        now = time.time()
+        cache_key = f'ratelimit:{key}'
+        bucket = self.cache.get(cache_key)
+        tokens = capacity if bucket is None else min(capacity, bucket[0] + (now - bucket[1]) * refill)
+        timeout = int(capacity / refill) + 1
+        if tokens < 1:
+            self.cache.set(cache_key, (tokens, now), timeout)
+            return (1 - tokens) / refill
+        self.cache.set(cache_key, (tokens - 1, now), timeout)
+        return 0
+
+
+def get_buckets():
+    alias = getattr(settings, 'RATE_LIMIT_CACHE', None)
+    return CacheBuckets(alias) if alias else LocalBuckets()
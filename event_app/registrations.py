@@ -0,0 +1,98 @@
+"""
+Duplicate suppression for event registrations.
+
+Double-submitted forms and refresh storms are answered from the cache
+once the event is looked up, before the form is validated or anything is
+written:
+
+* every registration form carries an idempotency key; the first submission
+  claims it with ``cache.add`` and repeats see the claim or the result;
+* ``(event, email)`` pairs known to be registered are cached, so another
+  attempt for the same pair is turned away without a transaction.
+
+The ``unique_together`` constraint stays the final guard, a race that gets
+past the cache ends in an IntegrityError which is reported the same way.
+
+Attendee dashboards are cached per user and day, ``forget_attendee_overview``
+drops the entry when the attendee registers for something.
+
+Deleting a registration (instance, queryset or cascade) forgets both through
+a post_delete receiver, so the attendee can register again right away.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete
+from django.utils import timezone
+
+from .models import EventRegistrations
+
+REGISTERED_TTL = 60 * 60 * 24
+IDEMPOTENCY_TTL = 60 * 10
+# Event edits and moderation are picked up within this long
+ATTENDEE_OVERVIEW_TTL = 60 * 5
+PENDING = 'pending'
+
+
+def _registered_key(event_id, email):
+    digest = hashlib.md5(email.strip().lower().encode()).hexdigest()
+    return f'registered:{event_id}:{digest}'
+
+
+def _submission_key(event_id, key):
+    return f'registration_submission:{event_id}:{key}'
+
+
+def is_registered(event_id, email):
+    return bool(email) and cache.get(_registered_key(event_id, email)) is not None
+
+
+def remember_registered(event_id, email):
+    cache.set(_registered_key(event_id, email), 1, REGISTERED_TTL)
+
+
+def forget_registered(event_id, email):
+    cache.delete(_registered_key(event_id, email))
+
+
+def claim_submission(event_id, key):
+    """
+    Claim idempotency ``key``. Returns None for the first submission,
+    otherwise ``PENDING`` or the registration id of the first one.
+    """
+    if not key:
+        return None
+    cache_key = _submission_key(event_id, key)
+    if cache.add(cache_key, PENDING, IDEMPOTENCY_TTL):
+        return None
+    return cache.get(cache_key, PENDING)
+
+
+def complete_submission(event_id, key, registration_id):
+    if key:
+        cache.set(_submission_key(event_id, key), registration_id, IDEMPOTENCY_TTL)
+
+
+def release_submission(event_id, key):
+    """Let the form be submitted again with the same key, e.g. after validation errors"""
+    if key:
+        cache.delete(_submission_key(event_id, key))
+
+
+def attendee_overview_key(user_id):
+    # Keyed by day as well, events move from upcoming to past at midnight
+    return f'attendee_overview:{user_id}:{timezone.localdate().isoformat()}'
+
+
+def forget_attendee_overview(*user_ids):
+    cache.delete_many([attendee_overview_key(user_id) for user_id in user_ids if user_id])
+
+
+def _registration_deleted(sender, instance, **kwargs):
+    forget_registered(instance.event_id, instance.email)
+    forget_attendee_overview(instance.user_id)
+
+
+def install():
+    """Connect the receiver that forgets deleted registrations"""
+    post_delete.connect(_registration_deleted, sender=EventRegistrations, dispatch_uid='registrations_registration_deleted')
@@ -0,0 +1,135 @@
+"""
+Database router sending reads from reporting/listing views to replicas.
+
+Reads only go to a replica inside a view wrapped with ``@read_replica`` and
+only when the visitor is not pinned to the primary. ``ReplicaPinMiddleware``
+pins a browser to the primary for ``REPLICA_STICKY_SECONDS`` after it makes a
+write, so organizers see their own edits straight away. Replicas lagging more
+than ``REPLICA_MAX_LAG_SECONDS`` (or failing the lag check) are skipped and
+reads fall back to ``default``.
+
+Local testing: point ``DATABASES['replica']`` at a second SQLite file (or
+MySQL schema), add ``'replica'`` to ``DATABASE_REPLICAS`` and run
+``manage.py migrate --database=replica``.
+"""
+import contextvars
+import random
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+# Per-request routing state, a dict so changes made in thread hops are shared
+_request_state = contextvars.ContextVar('db_routing_state', default=None)
+
+# alias -> (checked_at, healthy)
+_replica_health = {}
+LAG_CHECK_INTERVAL = 5
+
+
+def begin_request(pinned=False):
+    state = {'replica': False, 'pinned': pinned, 'wrote': False}
+    _request_state.set(state)
+    return state
+
+
+def end_request():
+    _request_state.set(None)
+
+
+def read_replica(view_func):
+    """Allow reads made by ``view_func`` (and its template) to use a replica"""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _wrapped_async(request, *args, **kwargs):
+            state = _request_state.get()
+            if state is None:
+                return await view_func(request, *args, **kwargs)
+            previous = state['replica']
+            state['replica'] = True
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                state['replica'] = previous
+        return _wrapped_async
+
+    @wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        state = _request_state.get()
+        if state is None:
+            return view_func(request, *args, **kwargs)
+        previous = state['replica']
+        state['replica'] = True
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            state['replica'] = previous
+    return _wrapped
+
+
+def replica_lag(alias):
+    """Return replication lag in seconds for ``alias``, None if replication is broken"""
+    connection = connections[alias]
+    if connection.vendor != 'mysql':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute('SHOW REPLICA STATUS')
+        row = cursor.fetchone()
+        if row is None:
+            # Not replicating, e.g. a second local schema used for testing
+            return 0
+        columns = [col[0] for col in cursor.description]
+    status = dict(zip(columns, row))
+    return status.get('Seconds_Behind_Source')
+
+
+def is_replica_healthy(alias):
+    now = time.monotonic()
+    cached = _replica_health.get(alias)
+    if cached and now - cached[0] < LAG_CHECK_INTERVAL:
+        return cached[1]
+
+    max_lag = getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 5)
+    try:
+        lag = replica_lag(alias)
+        healthy = lag is not None and lag <= max_lag
+    except DatabaseError as e:
+        lag = None
+        healthy = False
+        logger.warning('Replica %s lag check failed', alias, error=str(e))
+
+    if not healthy:
+        logger.warning('Replica %s skipped', alias, lag=lag, max_lag=max_lag)
+    _replica_health[alias] = (now, healthy)
+    return healthy
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if not state or not state['replica'] or state['pinned']:
+            return 'default'
+
+        replicas = [alias for alias in getattr(settings, 'DATABASE_REPLICAS', []) if is_replica_healthy(alias)]
+        if not replicas:
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state['wrote'] = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as default
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
@@ -0,0 +1,108 @@
+"""
+Cache-backed sessions with DB write-through, and compact view tracking.
+
+``SessionStore`` behaves like Django's ``cached_db`` engine except that when
+only cache-only keys (the viewed-events filter) changed it skips the DB
+write and refreshes the cache. Losing those keys on a cache eviction only
+means a view may be counted twice. Like ``cached_db`` it needs a cache
+shared by every worker, otherwise one process serves a session another one
+has since changed; settings only select it when REDIS_URL is set.
+"""
+import base64
+import hashlib
+
+from django.contrib.sessions.backends import cached_db
+
+VIEWED_EVENTS_KEY = '_viewed_events'
+LEGACY_VIEWED_PREFIX = 'viewed_event_'
+
+
+class SessionStore(cached_db.SessionStore):
+    cache_only_keys = frozenset([VIEWED_EVENTS_KEY])
+
+    def _persistent_digest(self, data):
+        return self.serializer().dumps({
+            key: value for key, value in data.items() if key not in self.cache_only_keys
+        })
+
+    def load(self):
+        data = super().load()
+        self._loaded_digest = self._persistent_digest(data)
+        return data
+
+    async def aload(self):
+        data = await super().aload()
+        self._loaded_digest = self._persistent_digest(data)
+        return data
+
+    def save(self, must_create=False):
+        loaded_digest = getattr(self, '_loaded_digest', None)
+        if (
+            not must_create
+            and self.session_key is not None
+            and loaded_digest is not None
+            and loaded_digest == self._persistent_digest(self._session)
+        ):
+            self._cache.set(self.cache_key, self._session, self.get_expiry_age())
+            return
+        super().save(must_create)
+        self._loaded_digest = self._persistent_digest(self._session)
+
+
+class SeenFilter:
+    """
+    Fixed-size Bloom filter of event ids a session has viewed.
+
+    2048 bits with 3 hashes stays under a 2% false-positive rate up to
+    ``CAPACITY`` ids, after which it starts over.
+    """
+    BITS = 2048
+    HASHES = 3
+    CAPACITY = 200
+
+    def __init__(self, data=None):
+        self.count = 0
+        self.bits = 0
+        if data:
+            count, encoded = data
+            raw = base64.b64decode(encoded)
+            # Filters saved with another size can't be read, start over
+            if len(raw) == self.BITS // 8:
+                self.count = count
+                self.bits = int.from_bytes(raw, 'big')
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(str(item).encode(), digest_size=8).digest()
+        h1 = int.from_bytes(digest[:4], 'big')
+        h2 = int.from_bytes(digest[4:], 'big') | 1
+        return [(h1 + i * h2) % self.BITS for i in range(self.HASHES)]
+
+    def __contains__(self, item):
+        return all(self.bits >> pos & 1 for pos in self._positions(item))
+
+    def add(self, item):
+        if self.count >= self.CAPACITY:
+            self.count = 0
+            self.bits = 0
+        for pos in self._positions(item):
+            self.bits |= 1 << pos
+        self.count += 1
+
+    def dump(self):
+        return [self.count, base64.b64encode(self.bits.to_bytes(self.BITS // 8, 'big')).decode()]
+
+
+def mark_event_viewed(session, event_id):
+    """Record that ``session`` viewed ``event_id``, return True on the first view"""
+    data = session.get(VIEWED_EVENTS_KEY)
+    if data is None:
+        # Drop the per-event keys older sessions accumulated
+        for key in [key for key in session.keys() if key.startswith(LEGACY_VIEWED_PREFIX)]:
+            del session[key]
+
+    seen = SeenFilter(data)
+    if event_id in seen:
+        return False
+    seen.add(event_id)
+    session[VIEWED_EVENTS_KEY] = seen.dump()
+    return True
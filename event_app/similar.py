@@ -0,0 +1,118 @@
+"""
+"People also registered for" recommendations.
+
+Registrations and favorites form a user-to-event graph. Two events are
+similar when the same users interact with both: the score is the cosine of
+their user sets, ``|A & B| / sqrt(|A| * |B|)``. Co-occurrence is counted
+sparsely by walking each user's events, so cost follows the number of
+interactions rather than events squared. Only the ``TOP_K`` best matches per
+event are stored in ``SimilarEvent``, so the detail page reads them with one
+indexed lookup.
+"""
+import heapq
+import math
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import Event, EventFavorite, EventRegistrations, SimilarEvent
+
+TOP_K = 10
+# Users with more interactions than this add noise and quadratic cost
+MAX_USER_EVENTS = 500
+BATCH_SIZE = 1000
+
+
+def _interactions(event_ids=None, user_ids=None, since=None):
+    """Distinct (user_id, event_id) pairs from registrations and favorites"""
+    registrations = EventRegistrations.objects.filter(user__isnull=False)
+    favorites = EventFavorite.objects.all()
+    if event_ids is not None:
+        registrations = registrations.filter(event_id__in=event_ids)
+        favorites = favorites.filter(event_id__in=event_ids)
+    if user_ids is not None:
+        registrations = registrations.filter(user_id__in=user_ids)
+        favorites = favorites.filter(attendee_id__in=user_ids)
+    if since is not None:
+        registrations = registrations.filter(registered_at__gte=since)
+        favorites = favorites.filter(favorited_at__gte=since)
+
+    pairs = set(registrations.values_list('user_id', 'event_id').order_by().iterator())
+    pairs.update(favorites.values_list('attendee_id', 'event_id').order_by().iterator())
+    return pairs
+
+
+def _top_similar(targets, user_events, popularity):
+    rows = []
+    for event_id in targets:
+        co_counts = defaultdict(int)
+        for user_id in popularity.get(event_id, ()):
+            events = user_events.get(user_id, ())
+            if len(events) > MAX_USER_EVENTS:
+                continue
+            for other_id in events:
+                if other_id != event_id:
+                    co_counts[other_id] += 1
+
+        size = len(popularity.get(event_id, ()))
+        best = heapq.nlargest(
+            TOP_K,
+            ((count / math.sqrt(size * len(popularity[other_id])), other_id) for other_id, count in co_counts.items()),
+        )
+        rows.extend(SimilarEvent(event_id=event_id, similar_id=other_id, score=score) for score, other_id in best)
+    return rows
+
+
+def build_similar_events(event_ids=None):
+    """
+    Recompute the top-K lists of ``event_ids`` (all events if None) and
+    replace their rows. Returns the number of rows written.
+    """
+    if event_ids is None:
+        pairs = _interactions()
+        targets = {event_id for _user_id, event_id in pairs}
+    else:
+        targets = set(event_ids)
+        users = {user_id for user_id, _event_id in _interactions(event_ids=targets)}
+        candidates = {event_id for _user_id, event_id in _interactions(user_ids=users)}
+        # Popularity has to count every user of a candidate, not just the shared ones
+        pairs = _interactions(event_ids=candidates)
+
+    user_events = defaultdict(set)
+    popularity = defaultdict(set)
+    for user_id, event_id in pairs:
+        user_events[user_id].add(event_id)
+        popularity[event_id].add(user_id)
+
+    rows = _top_similar(targets, user_events, popularity)
+    with transaction.atomic():
+        if event_ids is None:
+            SimilarEvent.objects.all().delete()
+        else:
+            SimilarEvent.objects.filter(event_id__in=targets).delete()
+        SimilarEvent.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    return len(rows)
+
+
+def refresh_similar_since(since):
+    """
+    Refresh the events whose similarities moved because of interactions
+    after ``since``: the events themselves and everything their new users
+    interacted with. Removed registrations, and the small drift in other
+    events' scores, are picked up by the next full rebuild.
+    """
+    recent = _interactions(since=since)
+    if not recent:
+        return 0
+    users = {user_id for user_id, _event_id in recent}
+    affected = {event_id for _user_id, event_id in _interactions(user_ids=users)}
+    return build_similar_events(affected)
+
+
+def similar_events(event_id, limit=4):
+    """Published events most similar to ``event_id``, best first, as SimilarEvent rows"""
+    return (
+        SimilarEvent.objects.filter(event_id=event_id, similar__status=Event.PUBLISHED)
+        .select_related('similar__organizer')
+        .order_by('-score')[:limit]
+    )
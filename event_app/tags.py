@@ -0,0 +1,121 @@
+"""
+Normalized event tags.
+
+``Event.tags`` stays the comma-separated input field, ``sync_event_tags``
+mirrors it into ``Tag``/``EventTag`` rows so events can be filtered by tag
+with an index lookup. ``Tag.published_count`` is the precomputed facet count
+of published events per tag, refreshed only for the tags an event touches:
+on ``Event.save``, from delete signals (so queryset and cascade deletes are
+covered too) and by ``refresh_counts_for_events`` after bulk updates, which
+skip both. ``rebuild_facets`` recounts every tag.
+"""
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, pre_delete
+from django.utils.text import slugify
+
+from .models import Event, EventTag, Tag
+
+
+def parse_tags(text):
+    """Return ``{slug: name}`` for a comma-separated tag string, first spelling wins"""
+    tags = {}
+    for name in (text or '').split(','):
+        name = name.strip()[:Tag._meta.get_field('name').max_length]
+        slug = slugify(name)[:Tag._meta.get_field('slug').max_length]
+        if slug and slug not in tags:
+            tags[slug] = name
+    return tags
+
+
+def get_or_create_tags(parsed):
+    """Return Tag rows for ``{slug: name}``, creating the missing ones in one insert"""
+    existing = {tag.slug: tag for tag in Tag.objects.filter(slug__in=parsed)}
+    missing = [Tag(slug=slug, name=name) for slug, name in parsed.items() if slug not in existing]
+    if missing:
+        Tag.objects.bulk_create(missing, ignore_conflicts=True)
+        existing.update({tag.slug: tag for tag in Tag.objects.filter(slug__in=[tag.slug for tag in missing])})
+    return existing
+
+
+def refresh_tag_counts(tag_ids=None):
+    """Recompute ``published_count`` for ``tag_ids`` (all tags if None)"""
+    published = (
+        EventTag.objects.filter(tag=OuterRef('pk'), event__status=Event.PUBLISHED)
+        .values('tag')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    tags = Tag.objects.all() if tag_ids is None else Tag.objects.filter(id__in=tag_ids)
+    tags.update(published_count=Coalesce(Subquery(published), Value(0)))
+
+
+def sync_event_tags(event):
+    """Mirror ``event.tags`` into EventTag rows and refresh the affected facet counts"""
+    tags = get_or_create_tags(parse_tags(event.tags))
+    wanted = {tag.id for tag in tags.values()}
+    current = set(EventTag.objects.filter(event=event).values_list('tag_id', flat=True))
+
+    if current - wanted:
+        EventTag.objects.filter(event=event, tag_id__in=current - wanted).delete()
+    if wanted - current:
+        EventTag.objects.bulk_create(
+            [EventTag(event=event, tag_id=tag_id) for tag_id in wanted - current],
+            ignore_conflicts=True,
+        )
+    # Status changes move the event in or out of every tag's published count
+    refresh_tag_counts(current | wanted)
+
+
+def refresh_counts_for_events(event_ids):
+    """Refresh facet counts after a bulk status change on ``event_ids``"""
+    tag_ids = set(EventTag.objects.filter(event_id__in=event_ids).values_list('tag_id', flat=True))
+    if tag_ids:
+        refresh_tag_counts(tag_ids)
+
+
+def _event_pre_delete(sender, instance, **kwargs):
+    # The EventTag rows go with the event, remember which tags to recount
+    instance._deleted_tag_ids = list(EventTag.objects.filter(event_id=instance.pk).values_list('tag_id', flat=True))
+
+
+def _event_post_delete(sender, instance, **kwargs):
+    tag_ids = getattr(instance, '_deleted_tag_ids', None)
+    if tag_ids:
+        refresh_tag_counts(tag_ids)
+
+
+def install():
+    """Connect the receivers that keep tag counts right when events are deleted"""
+    pre_delete.connect(_event_pre_delete, sender=Event, dispatch_uid='tags_event_pre_delete')
+    post_delete.connect(_event_post_delete, sender=Event, dispatch_uid='tags_event_post_delete')
+
+
+def tag_facets(limit=20):
+    """Most used tags among published events, read straight from the precomputed counts"""
+    return Tag.objects.filter(published_count__gt=0).order_by('-published_count', 'name')[:limit]
+
+
+def filter_by_tag(queryset, slug):
+    if not slug:
+        return queryset
+    return queryset.filter(event_tags__tag__slug=slug)
+
+
+def link_new_event_tags(events):
+    """
+    Create EventTag rows for unpublished events inserted with ``bulk_create``,
+    which skips ``Event.save``. Published counts are unaffected until approval.
+    """
+    parsed = {event.pk: parse_tags(event.tags) for event in events}
+    names = {}
+    for tags in parsed.values():
+        for slug, name in tags.items():
+            names.setdefault(slug, name)
+    if not names:
+        return
+    tags = get_or_create_tags(names)
+    EventTag.objects.bulk_create(
+        [EventTag(event_id=event_id, tag=tags[slug]) for event_id, slugs in parsed.items() for slug in slugs],
+        ignore_conflicts=True,
+    )
@@ -0,0 +1,34 @@
+"""
+Background tasks run by ``run_workers``, see event_app/jobs.py.
+"""
+import requests
+from django.conf import settings
+
+from .jobs import task
+from .models import Event, Notification
+from .utils import notify_admins, notify_event_attendees, push_notifications
+
+
+@task(priority=10)
+def push_user_notifications(notifications):
+    """Save and push ``notifications``, a list of ``{'user_id', 'message', 'url'}``"""
+    push_notifications([Notification(**notify) for notify in notifications])
+
+
+@task(priority=10)
+def send_admin_notification(message, url=None):
+    notify_admins(message, url=url)
+
+
+@task(priority=5)
+def email_event_attendees(event_id, subject, template_name):
+    event = Event.objects.filter(id=event_id).first()
+    if event is not None:
+        notify_event_attendees(event, subject, template_name)
+
+
+@task(max_attempts=8)
+def post_admin_webhook(payload):
+    # Raise on failure so the job is retried with backoff
+    response = requests.post(settings.ADMIN_WEBHOOK_URL, json=payload, timeout=5)
+    response.raise_for_status()
@@ -0,0 +1,11 @@
+from django import template
+
+from event_app.categories import get_category
+
+register = template.Library()
+
+
+@register.filter
+def category_info(value):
+    """Registry entry for a category value, e.g. ``{{ event.category|category_info }}``"""
+    return get_category(value)
@@ -1,3 +1,156 @@
-from django.test import TestCase
+from datetime import time, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import answers
+from .checkin import check_in, forget_check_in_set, ticket_code
+from .models import Budget, BudgetItem, Event, EventRegistrations, FormField
+from .registrations import claim_submission
+
+User = get_user_model()
+
+
+def make_event(**kwargs):
+    organizer = User.objects.create(username=f'organizer{User.objects.count()}', role='organizer')
+    start = timezone.localdate() + timedelta(days=7)
+    fields = {
+        'title': 'Test event', 'description': 'Test', 'category': 'technology', 'status': Event.PUBLISHED,
+        'organizer': organizer, 'start_date': start, 'end_date': start,
+        'start_time': time(9), 'end_time': time(17), 'venue': 'Hall', 'city': 'Cape Town',
+    }
+    fields.update(kwargs)
+    return Event.objects.create(**fields)
+
+
+class RegistrationDuplicateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.event = make_event()
+        self.url = reverse('register_for_event', args=[self.event.id])
+
+    def register(self, key, email='attendee@example.com'):
+        return self.client.post(self.url, {
+            'idempotency_key': key, 'email': email, 'username': email, 'first_name': 'Ada', 'last_name': 'Lovelace',
+        })
+
+    def test_register_again_after_registration_is_deleted(self):
+        self.register('first')
+        self.assertEqual(EventRegistrations.objects.filter(event=self.event).count(), 1)
+
+        EventRegistrations.objects.filter(event=self.event).delete()
+        self.register('second')
+        self.assertEqual(EventRegistrations.objects.filter(event=self.event).count(), 1)
+
+    def test_already_registered_releases_the_claim(self):
+        self.register('first')
+        self.register('second')
+        self.assertEqual(EventRegistrations.objects.filter(event=self.event).count(), 1)
+        self.assertIsNone(claim_submission(self.event.id, 'second'))
+
+
+class BudgetTotalTests(TestCase):
+    def setUp(self):
+        self.budget = Budget.objects.create(event=make_event())
+
+    def total(self):
+        self.budget.refresh_from_db()
+        return self.budget.total_amount
+
+    def test_total_follows_item_changes(self):
+        first = BudgetItem.objects.create(budget=self.budget, name='Venue', amount=10.1)
+        BudgetItem.objects.create(budget=self.budget, name='Food', amount=Decimal('5.00'))
+        self.assertEqual(self.total(), Decimal('15.10'))
+
+        first = BudgetItem.objects.get(pk=first.pk)
+        first.amount = Decimal('12.25')
+        first.save()
+        self.assertEqual(self.total(), Decimal('17.25'))
+
+        first.delete()
+        self.assertEqual(self.total(), Decimal('5.00'))
+
+        BudgetItem.objects.filter(budget=self.budget).delete()
+        self.assertEqual(self.total(), Decimal('0.00'))
+
+    def test_replace_items_with_float_amounts(self):
+        BudgetItem.objects.create(budget=self.budget, name='Old', amount=Decimal('99.00'))
+        self.budget.replace_items([BudgetItem(name='Venue', amount=0.1), BudgetItem(name='Food', amount=0.2)])
+        self.assertEqual(self.total(), Decimal('0.30'))
+
+
+class CheckInTests(TestCase):
+    def setUp(self):
+        self.event = make_event()
+        self.registrations = [
+            EventRegistrations.objects.create(event=self.event, email=f'guest{index}@example.com')
+            for index in range(3)
+        ]
+        self.codes = [ticket_code(registration) for registration in self.registrations]
+        forget_check_in_set(self.event.id)
+
+    def test_duplicates_and_deleted_registrations(self):
+        result = check_in(self.event.id, self.codes[:2] + self.codes[:1])
+        self.assertEqual((result['checked_in'], result['duplicate'], result['invalid']), (2, 1, []))
+
+        self.registrations[2].delete()
+        result = check_in(self.event.id, self.codes[1:])
+        self.assertEqual((result['checked_in'], result['duplicate'], result['invalid']), (0, 1, [self.codes[2]]))
+
+    def test_reset_check_in_can_be_scanned_again(self):
+        check_in(self.event.id, self.codes[:1])
+        EventRegistrations.objects.filter(pk=self.registrations[0].pk).update(checked_in_at=None)
+        # Another registration deleted, e.g. cancelled at the door
+        self.registrations[1].delete()
+        self.assertEqual(check_in(self.event.id, self.codes[:1])['checked_in'], 1)
+
+
+@override_settings(REGISTRATION_ANSWERS_STORAGE='json')
+class AnswerFilterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.event = make_event()
+        self.size = FormField.objects.create(
+            event=self.event, label='Size', field_type='select', choices='["S", "M"]', order=1,
+        )
+        self.age = FormField.objects.create(event=self.event, label='Age', field_type='number', order=2)
+
+    def register(self, email, values):
+        form_fields = list(FormField.objects.filter(event=self.event).order_by('order'))
+        registration = EventRegistrations(event=self.event, email=email)
+        answers.set_answers(registration, answers.get_schema(self.event.id, form_fields), values)
+        registration.save()
+        return registration
+
+    def emails(self, field, value):
+        registrations = answers.filter_by_answer(EventRegistrations.objects.all(), self.event.id, field.id, value)
+        return sorted(registrations.values_list('email', flat=True))
+
+    def test_filters_across_form_versions(self):
+        self.register('a@example.com', {self.size.id: 'M', self.age.id: 33})
+        self.register('b@example.com', {self.size.id: 'S', self.age.id: '41'})
+        # A new first field moves Size to the second filter slot
+        diet = FormField.objects.create(
+            event=self.event, label='Diet', field_type='radio', choices='["vegan", "any"]', order=0,
+        )
+        self.register('c@example.com', {diet.id: 'any', self.size.id: 'M', self.age.id: 33.0})
+
+        self.assertEqual(self.emails(self.size, 'M'), ['a@example.com', 'c@example.com'])
+        self.assertEqual(self.emails(self.age, '33'), ['a@example.com', 'c@example.com'])
+        self.assertEqual(self.emails(self.age, 41), ['b@example.com'])
+        self.assertEqual(self.emails(self.size, 'XL'), [])
+        self.assertEqual(self.emails(diet, 'any'), ['c@example.com'])
+
+    def test_attendee_list_filter(self):
+        self.register('a@example.com', {self.size.id: 'M'})
+        self.register('b@example.com', {self.size.id: 'S'})
+        self.client.force_login(self.event.organizer)
+        response = self.client.get(
+            reverse('event_analytics', args=[self.event.id]), {'answer': f'{self.size.id}:S'},
+        )
+        self.assertEqual([registration.email for registration in response.context['registered_users']], ['b@example.com'])
+        self.assertEqual(response.context['answer_filters'][0]['label'], 'Size')
@@ -0,0 +1,81 @@
+"""
+Trending scores with exponential time decay.
+
+Each view, registration or favorite adds ``weight * 2 ** ((t - epoch) / half_life)``
+to the event's ``EventTrend.score``. Comparing scores then gives the same
+order as decaying every score to the present, without ever touching the
+events that had no activity. Scores grow with time since the epoch, so
+``rescale_trending`` periodically multiplies every score down and moves the
+epoch to now (weekly is plenty for a 24h half-life).
+
+The epoch is cached for ``EPOCH_TTL`` only: with a per-process cache the
+other processes learn about a rescale when their copy expires. Increments
+computed against the old epoch in that window (or just before a rescale
+and applied just after it) are over-weighted; scores are a ranking signal
+so this is accepted.
+"""
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import EventTrend, TrendingEpoch
+
+WEIGHTS = {
+    'view': 1.0,
+    'favorite': 3.0,
+    'registration': 5.0,
+}
+EPOCH_CACHE_KEY = 'trending:epoch'
+EPOCH_TTL = 60
+# Scores this small after rescaling no longer affect the ranking
+MIN_SCORE = 1e-3
+
+
+def decay_rate():
+    half_life = getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 24) * 3600
+    return math.log(2) / half_life
+
+
+def current_epoch():
+    epoch = cache.get(EPOCH_CACHE_KEY)
+    if epoch is None:
+        row, _created = TrendingEpoch.objects.get_or_create(pk=1, defaults={'started_at': timezone.now()})
+        epoch = row.started_at.timestamp()
+        cache.set(EPOCH_CACHE_KEY, epoch, EPOCH_TTL)
+    return epoch
+
+
+def boost(kind, count=1, at=None):
+    at = (at or timezone.now()).timestamp()
+    return WEIGHTS[kind] * count * math.exp(decay_rate() * (at - current_epoch()))
+
+
+def record_activity(event_id, kind, count=1):
+    """Add ``count`` activities of ``kind`` to the event's score in one UPDATE"""
+    amount = boost(kind, count)
+    if EventTrend.objects.filter(event_id=event_id).update(score=F('score') + amount):
+        return
+    EventTrend.objects.bulk_create([EventTrend(event_id=event_id)], ignore_conflicts=True)
+    EventTrend.objects.filter(event_id=event_id).update(score=F('score') + amount)
+
+
+arecord_activity = sync_to_async(record_activity)
+
+
+def rescale():
+    """Scale every score to the current time and move the epoch there"""
+    now = timezone.now()
+    with transaction.atomic():
+        epoch, _created = TrendingEpoch.objects.select_for_update().get_or_create(pk=1, defaults={'started_at': now})
+        factor = math.exp(-decay_rate() * (now - epoch.started_at).total_seconds())
+        EventTrend.objects.update(score=F('score') * factor)
+        removed, _ = EventTrend.objects.filter(score__lt=MIN_SCORE).delete()
+        epoch.started_at = now
+        epoch.save(update_fields=['started_at'])
+    cache.set(EPOCH_CACHE_KEY, now.timestamp(), EPOCH_TTL)
+    return factor, removed
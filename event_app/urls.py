@@ -10,8 +10,10 @@ urlpatterns = [
     path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
     path('admin/create-user/', views.admin_create_user, name='admin_create_user'),
     path('events/<int:event_id>/register', event_views.register_for_event, name='register_for_event'),
+    path('registrations/receipt/<str:receipt>/', event_views.registration_receipt, name='registration_receipt'),
     path('organizer-overview/', views.organizer_overview, name='organizer_overview'),
     path('add-event/', event_views.create_event, name="create_event"),
+    path('add-event/import/', event_views.import_events_view, name='import_events'),
     path('event-analytics/<int:event_id>/', event_views.event_analytics, name="event_analytics"),
     path('event-details/<int:event_id>/', event_views.view_event, name='event_details'),
     path("events/<int:event_id>/cancel/", event_views.cancel_event, name="cancel_event"),
@@ -20,6 +22,10 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     path("attendee/logout/", views.attendee_logout, name="attendee_logout"),
     path('upcoming/', event_views.upcoming_events_view, name='upcoming_events'),
+    path('browse/', event_views.browse_events, name='browse_events'),
+    path('calendar/attendee/<str:token>.ics', event_views.attendee_calendar_feed, name='attendee_calendar_feed'),
+    path('calendar/organizer/<int:user_id>.ics', event_views.organizer_calendar_feed, name='organizer_calendar_feed'),
+    path('calendar/category/<slug:category>.ics', event_views.category_calendar_feed, name='category_calendar_feed'),
     path('users/<int:user_id>/attendee_overview/', views.attendee_overview, name='attendee_overview'),
     path('events/<int:event_id>/budget/', event_views.event_budget_view, name='event_budget'),
     path('search/', event_views.search_events, name='search'),
@@ -29,10 +35,13 @@ urlpatterns = [
 
     # AJAX endpoint
     path('api/event/<int:event_id>/add-field/', event_views.create_form_field, name='create_form_field'),
+    path('api/event/<int:event_id>/budget/items/', event_views.budget_items_api, name='budget_items_api'),
+    path('api/event/<int:event_id>/check-in/', event_views.check_in_api, name='check_in_api'),
 
     #admin endpoint
     path('users/', views.users_list_view, name='users'),
     path('events/', admin_views.events_list_view, name='events'),
+    path('events/bulk-moderate/', admin_views.bulk_moderate_events_view, name='bulk_moderate_events'),
     path('events/<int:event_id>/preview', admin_views.preview_event, name='preview'),
     path('events/<int:event_id>/approve/', admin_views.event_approval_view, name='approval'),
     #path('events/<int:event_id>/edit', admin_views.admin_edit_event, name='admin_edit_event'),
@@ -40,5 +49,8 @@ urlpatterns = [
     path('users/<int:user_id>/edit/', views.edit_user_view, name='edit_user'),
     path('events/<int:event_id>/reject/', admin_views.reject_event_view, name='reject_event'),
     path('events/<int:event_id>/views-attendee/', admin_views.registered_user_in_event, name='registered_users'),
+    path('api/db-stats/', views.db_connection_stats, name='db_connection_stats'),
+    path('api/notifications/', views.notifications_api, name='notifications_api'),
+    path('api/notifications/mark-read/', views.mark_notifications_read_api, name='mark_notifications_read'),
     
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
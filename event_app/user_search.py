@@ -0,0 +1,115 @@
+"""
+Admin user search that stays interactive on large user tables.
+
+Terms shorter than ``NGRAM_MIN_LENGTH`` are prefix matches on username,
+email, first and last name, each backed by its own index. Longer terms on
+MySQL go through the ``user_search_ngram_idx`` FULLTEXT index (ngram
+parser), which finds the term anywhere in those columns; other backends
+fall back to a contains match.
+
+Pages are keyset paginated on the id, newest first, so deep pages cost the
+same as the first one. Counts are estimated by default: table statistics
+for the unfiltered list, otherwise a count capped at ``COUNT_CAP``. The
+exact count is only computed on request and then cached.
+"""
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+User = get_user_model()
+
+NGRAM_MIN_LENGTH = 3
+SEARCH_FIELDS = ('username', 'email', 'first_name', 'last_name')
+PAGE_SIZE = 20
+COUNT_CAP = 1000
+EXACT_COUNT_TTL = 60 * 5
+
+
+def search_users(queryset, term):
+    term = term.strip()
+    if not term:
+        return queryset
+    connection = connections[queryset.db]
+    if len(term) < NGRAM_MIN_LENGTH:
+        return queryset.filter(_any_field('istartswith', term))
+    if connection.vendor != 'mysql':
+        return queryset.filter(_any_field('icontains', term))
+
+    quote = connection.ops.quote_name
+    # A quoted phrase matches the term's ngrams in sequence, i.e. as a substring
+    phrase = '"{}"'.format(term.replace('"', ' '))
+    matches = RawSQL(
+        f'SELECT {quote("id")} FROM {quote(User._meta.db_table)} '
+        f'WHERE MATCH({", ".join(quote(field) for field in SEARCH_FIELDS)}) AGAINST (%s IN BOOLEAN MODE)',
+        [phrase],
+    )
+    return queryset.filter(id__in=matches)
+
+
+def _any_field(lookup, term):
+    condition = Q()
+    for field in SEARCH_FIELDS:
+        condition |= Q(**{f'{field}__{lookup}': term})
+    return condition
+
+
+def keyset_page(queryset, before=None, after=None, per_page=PAGE_SIZE):
+    """
+    One page of ``queryset`` newest first. ``before`` pages to older users
+    and ``after`` back to newer ones; returns the users and the cursors for
+    the older and newer pages (None at either end).
+    """
+    if after is not None:
+        users = list(queryset.filter(id__gt=after).order_by('id')[:per_page + 1])
+        newer = users[per_page - 1].id if len(users) > per_page else None
+        users = users[:per_page][::-1]
+        # We came from the older page, so it exists
+        older = users[-1].id if users else None
+        return users, older, newer
+
+    if before is not None:
+        queryset = queryset.filter(id__lt=before)
+    users = list(queryset.order_by('-id')[:per_page + 1])
+    older = users[per_page - 1].id if len(users) > per_page else None
+    users = users[:per_page]
+    newer = users[0].id if before is not None and users else None
+    return users, older, newer
+
+
+def _table_estimate(queryset):
+    """Row estimate from MySQL table statistics, None elsewhere"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'mysql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def estimated_count(queryset, filtered):
+    """``{'value', 'exact', 'capped'}`` without counting more than ``COUNT_CAP`` rows"""
+    if not filtered:
+        estimate = _table_estimate(queryset)
+        if estimate is not None:
+            return {'value': estimate, 'exact': False, 'capped': False}
+    count = queryset.order_by()[:COUNT_CAP + 1].count()
+    capped = count > COUNT_CAP
+    return {'value': min(count, COUNT_CAP), 'exact': not capped, 'capped': capped}
+
+
+def exact_count(queryset, signature):
+    """Exact count cached under ``signature``, the filter parameters"""
+    key = f'user_search_count:{hashlib.md5(signature.encode()).hexdigest()}'
+    count = cache.get(key)
+    if count is None:
+        count = queryset.order_by().count()
+        cache.set(key, count, EXACT_COUNT_TTL)
+    return {'value': count, 'exact': True, 'capped': False}
@@ -1,6 +1,14 @@
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.conf import settings
+from django.core.paginator import Paginator, Page, PageNotAnInteger, EmptyPage
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+
+from .log import get_logger
+
+logger = get_logger(__name__)
 
 def notify_event_attendees(event, subject, template_name, context_extra=None):
     """Send HTML email notification to all registered attendees."""
@@ -21,3 +29,56 @@ def notify_event_attendees(event, subject, template_name, context_extra=None):
     msg = EmailMultiAlternatives(subject, text_content, settings.DEFAULT_FROM_EMAIL, recipient_list)
     msg.attach_alternative(html_content, "text/html")
     msg.send()
+
+
+def push_notifications(notifications):
+    """Save ``Notification`` objects in one insert and push each to its user's socket group."""
+    from .models import Notification
+    from .notifications import adjust_unread
+
+    notifications = Notification.objects.bulk_create(notifications)
+    channel_layer = get_channel_layer()
+    for notify in notifications:
+        async_to_sync(channel_layer.group_send)(
+            f'user_{notify.user_id}',
+            {
+                'type': 'send_notification',
+                'message': notify.message,
+                'url': notify.url,
+                'created_at': notify.created_at.strftime("%Y-%m-%d %H:%M"),
+                'unread_count': adjust_unread(notify.user_id, 1),
+            }
+        )
+    return notifications
+
+
+def notify_admins(message, url=None):
+    from .models import Notification
+
+    admins = get_user_model().objects.filter(is_staff=True).values_list('id', flat=True)
+    notifications = push_notifications([
+        Notification(user_id=admin_id, message=message, url=url) for admin_id in admins
+    ])
+    logger.debug('Admins notified', admins=len(notifications), url=url)
+
+
+async def alist(queryset):
+    """Evaluate ``queryset`` asynchronously into a list"""
+    return [obj async for obj in queryset]
+
+
+async def apaginate(queryset, per_page, page_number):
+    """Async counterpart of ``Paginator(queryset, per_page).get_page(page_number)``"""
+    paginator = Paginator(queryset, per_page)
+    # count is a cached_property, fill it in so the paginator never counts synchronously
+    paginator.count = await queryset.acount()
+    try:
+        number = paginator.validate_number(page_number)
+    except PageNotAnInteger:
+        number = 1
+    except EmptyPage:
+        number = paginator.num_pages
+
+    bottom = (number - 1) * per_page
+    object_list = [obj async for obj in queryset[bottom:bottom + per_page]]
+    return Page(object_list, number, paginator)
@@ -3,22 +3,37 @@ from django.contrib.auth import login, authenticate
 from django.contrib.auth import logout, get_user_model
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.core.paginator import Paginator
 from django.contrib.auth.forms import AuthenticationForm
-from django.db.models import Count, F, Avg, Sum
+from django.db.models import Count, F, Avg, Sum, Q
 from datetime import datetime
 from django.utils import timezone
 import json
 from django.utils.timezone import now
+from django.http import JsonResponse
+from django.urls import reverse
+from django.core.cache import cache
+from django.utils.text import slugify
+import asyncio
 
 
 
 from .forms import UserRegistrationForm, AdminUserCreationForm, EventForm, AdminUserChangeForm
 from .models import Event, EventRegistrations, CustomUser
 from .filters import UserFilter
+from .log import get_logger
+from .routers import read_replica
+from .tags import filter_by_tag, tag_facets
+from .utils import alist
+from .categories import category_chart_payload
+from .ical import feed_token
+from .registrations import ATTENDEE_OVERVIEW_TTL, attendee_overview_key
+from . import db_metrics, notifications, user_search
 
 User = get_user_model()
+logger = get_logger(__name__)
 # Create your views here.
+@read_replica
 def admin_dashboard(request):
     # Stats
     total_users = CustomUser.objects.count()
@@ -45,28 +60,7 @@ def admin_dashboard(request):
         .annotate(total=Count("id"))
         .order_by("category")
     )
-    total_events = Event.objects.count()
-    category_data = []
-    for c in category_counts:
-        percentage = (c["total"] / total_events * 100) if total_events > 0 else 0
-        category_data.append({
-            "category": c["category"],
-            "label": dict(Event.CATEGORY_CHOICES).get(c["category"], "Other"),
-            "percentage": round(percentage, 1),
-            "color": {
-                Event.MUSIC_ARTS: '#FF6384',
-                Event.BUSINESS: '#36A2EB',
-                Event.SPORTS: '#FFCE56',
-                Event.TECHNOLOGY: '#4BC0C0',
-                Event.FOOD_DRINK: '#9966FF',
-                Event.HEALTH_WELLNESS: '#FF9F40',
-                Event.EDUCATION: '#FF6384',
-                Event.COMMUNITY: '#C9CBCF',
-                Event.CHARITY: '#4BC0C0',
-                Event.GOVERNMENT: '#36A2EB',
-                Event.TOURISM: '#FFCE56'
-            }.get(c["category"], "#999999"),
-        })
+    category_chart_data, category_data = category_chart_payload(category_counts, count_key="total")
     
     # Fetching upcomming events
     events = Event.objects.filter(start_date__gte=now(), status=Event.PUBLISHED).order_by('start_date')
@@ -81,6 +75,7 @@ def admin_dashboard(request):
         "avg_conversion_rate": avg_conversion_rate,
         "top_organizers": top_organizers,
         "category_data": category_data,
+        "category_chart_data": category_chart_data,
         "upcoming_events": upcoming_events
     }
     return render(request, "adminDashboard.html", context)
@@ -137,17 +132,16 @@ def login_view(request):
     return render(request, "login.html", {"form": AuthenticationForm()})
 
 def attendee_login(request):
-    print('Attendee Attempt...')
     if request.method == "POST":
         email = request.POST.get('email')  # ✅ use POST instead of clean_data
         user = User.objects.filter(email=email).first()
-        print(user)
+        logger.debug('Attendee login attempt', found=user is not None)
         if user:
             # You might want to "log in" the attendee in session
             request.session['attendee_id'] = user.id
             login(request, user)
             messages.success(request, f"Welcome back, {user.first_name}!")
-            return redirect('attendee_overview')
+            return redirect('attendee_overview', user_id=user.id)
         else:
             messages.error(request, "User not found!!")
     return render(request, 'login.html')
@@ -242,49 +236,13 @@ def organizer_overview(request):
         count=Count('id')
     ).order_by('-count')
     
-    # Prepare chart data
-    chart_labels = []
-    chart_data = []
-    chart_colors = []
+    chart_data_json, category_data = category_chart_payload(category_data, total=total_events)
     
-    # Color mapping for each category
-    category_colors = {
-        Event.MUSIC_ARTS: '#FF6384',
-        Event.BUSINESS: '#36A2EB', 
-        Event.SPORTS: '#FFCE56',
-        Event.TECHNOLOGY: '#4BC0C0',
-        Event.FOOD_DRINK: '#9966FF',
-        Event.HEALTH_WELLNESS: '#FF9F40',
-        Event.EDUCATION: '#FF6384',
-        Event.COMMUNITY: '#C9CBCF',
-        Event.CHARITY: '#4BC0C0',
-        Event.GOVERNMENT: '#36A2EB',
-        Event.TOURISM: '#FFCE56'
-    }
-    
-    # Calculate percentages and prepare chart data
-    for item in category_data:
-        category = item['category']
-        count = item['count']
-        percentage = round((count / total_events) * 100, 1) if total_events > 0 else 0
-        
-        # Get category display name
-        category_display = dict(Event.CATEGORY_CHOICES).get(category, category)
-        
-        chart_labels.append(category_display)
-        chart_data.append(percentage)
-        chart_colors.append(category_colors.get(category, '#C9CBCF'))
-    
-    # Convert to JSON for JavaScript
-    chart_data_json = json.dumps({
-        'labels': chart_labels,
-        'data': chart_data,
-        'colors': chart_colors
-    })
-    
-    print(f"Total events: {total_events}")
-    print(f"Published: {published_events_count}, Draft: {draft_events_count}")
-    print(f"Upcoming this month: {upcoming_events_count}")
+    logger.debug(
+        'Organizer overview for user %s', organizer.id,
+        total=total_events, published=published_events_count,
+        draft=draft_events_count, upcoming_this_month=upcoming_events_count,
+    )
     
     context = {
         'total_events': total_events,
@@ -309,113 +267,141 @@ def logout_success(request):
     return render(request, 'logout.html')
 
 
-def home_view(request):
-    events = Event.objects.filter(status=Event.PUBLISHED)
-    return render(request, 'home.html', {'events': events})
+HOME_EVENTS_CACHE_KEY = 'home_events'
+HOME_EVENTS_TTL = 30
 
+async def published_home_events(tag='', sort=''):
+    '''Published events for the home page, optionally for one tag, cached briefly'''
+    cache_key = f'{HOME_EVENTS_CACHE_KEY}:{tag}:{sort}'
+    events = await cache.aget(cache_key)
+    if events is None:
+        queryset = (
+            Event.objects.filter(status=Event.PUBLISHED)
+            .select_related('organizer')
+            .annotate(attendee_count=Count('attendees'))
+        )
+        if sort == 'trending':
+            queryset = queryset.order_by(F('trend__score').desc(nulls_last=True), '-created_at')
+        queryset = filter_by_tag(queryset, tag)
+        events = [event async for event in queryset.aiterator()]
+        await cache.aset(cache_key, events, HOME_EVENTS_TTL)
+    return events
+
+@read_replica
+async def home_view(request):
+    tag = slugify(request.GET.get('tag', ''))
+    sort = 'trending' if request.GET.get('sort') == 'trending' else ''
+    # Resolve the user up front so the template never touches the DB
+    events, tags, request.user = await asyncio.gather(
+        published_home_events(tag, sort),
+        alist(tag_facets()),
+        request.auser(),
+    )
+    return render(request, 'home.html', {'events': events, 'tags': tags, 'active_tag': tag, 'active_sort': sort})
 
-def attendee_overview(request, user_id):
-    attendee = get_object_or_404(User, id=user_id)
-    now = timezone.now()
 
-    # Events the user is attending
-    #events = Event.objects.filter(attendees=attendee).distinct()
-    events = EventRegistrations.objects.filter(user=attendee)
-    
-    total_events = events.count()
-    
-    upcoming_events = events.filter(start_date__gte=now.date(), status=Event.PUBLISHED)
-    upcoming_events_count = upcoming_events.count()
-    
-    past_events = events.filter(start_date__lt=now.date(), status=Event.PUBLISHED)
-    past_events_count = past_events.count()
+def attendee_overview_data(attendee):
+    """
+    Registration counts (total, upcoming, past, per category) and the
+    upcoming registrations of ``attendee``, cached per user for the day.
+    """
+    cache_key = attendee_overview_key(attendee.id)
+    data = cache.get(cache_key)
+    if data is not None:
+        return data
+
+    today = timezone.localdate()
+    registrations = EventRegistrations.objects.filter(user=attendee)
+    published = Q(event__status=Event.PUBLISHED)
+    # One pass over the registrations joined to their events, grouped by category
+    rows = list(
+        registrations.values('event__category')
+        .annotate(
+            count=Count('id'),
+            upcoming=Count('id', filter=published & Q(event__start_date__gte=today)),
+            past=Count('id', filter=published & Q(event__start_date__lt=today)),
+        )
+        .order_by('-count')
+    )
+    upcoming_events = list(
+        registrations.filter(published, event__start_date__gte=today)
+        .select_related('event', 'event__organizer')
+        .order_by('event__start_date', 'event__start_time')
+    )
 
-    # Events grouped by category
-    category_data = events.values('category').annotate(
-        count=Count('id')
-    ).order_by('-count')
-    
-    # Prepare chart data
-    chart_labels = []
-    chart_data = []
-    chart_colors = []
-
-    # Color mapping for categories (same as organizer)
-    category_colors = {
-        Event.MUSIC_ARTS: '#FF6384',
-        Event.BUSINESS: '#36A2EB', 
-        Event.SPORTS: '#FFCE56',
-        Event.TECHNOLOGY: '#4BC0C0',
-        Event.FOOD_DRINK: '#9966FF',
-        Event.HEALTH_WELLNESS: '#FF9F40',
-        Event.EDUCATION: '#FF6384',
-        Event.COMMUNITY: '#C9CBCF',
-        Event.CHARITY: '#4BC0C0',
-        Event.GOVERNMENT: '#36A2EB',
-        Event.TOURISM: '#FFCE56'
+    data = {
+        'total': sum(row['count'] for row in rows),
+        'upcoming': sum(row['upcoming'] for row in rows),
+        'past': sum(row['past'] for row in rows),
+        'categories': [{'category': row['event__category'], 'count': row['count']} for row in rows],
+        'upcoming_events': upcoming_events,
     }
+    cache.set(cache_key, data, ATTENDEE_OVERVIEW_TTL)
+    return data
 
-    for item in category_data:
-        category = item['category']
-        count = item['count']
-        percentage = round((count / total_events) * 100, 1) if total_events > 0 else 0
-        category_display = dict(Event.CATEGORY_CHOICES).get(category, category)
-        
-        chart_labels.append(category_display)
-        chart_data.append(percentage)
-        chart_colors.append(category_colors.get(category, '#C9CBCF'))
-
-    chart_data_json = json.dumps({
-        'labels': chart_labels,
-        'data': chart_data,
-        'colors': chart_colors
-    })
-
-    # Order events by start date (soonest first)
-    upcoming_events_ordered = upcoming_events.order_by('start_date')
+@login_required
+def attendee_overview(request, user_id):
+    attendee = request.user if request.user.pk == user_id else get_object_or_404(User, id=user_id)
+    data = attendee_overview_data(attendee)
+    chart_data_json, category_data = category_chart_payload(data['categories'], total=data['total'])
 
-    print(f"Total registered events: {total_events}")
-    print(f"Upcoming events: {upcoming_events_count}, Past events: {past_events_count}")
+    logger.debug(
+        'Attendee overview for user %s', attendee.id,
+        total=data['total'], upcoming=data['upcoming'], past=data['past'],
+    )
 
     context = {
         'attendee': attendee.first_name,
-        'total_events': total_events,
-        'upcoming_events_count': upcoming_events_count,
-        'past_events_count': past_events_count,
-        'attendee_events': upcoming_events_ordered,  # or all events, if needed
+        'total_events': data['total'],
+        'upcoming_events_count': data['upcoming'],
+        'past_events_count': data['past'],
+        'attendee_events': data['upcoming_events'],
         'category_chart_data': chart_data_json,
         'category_breakdown': category_data,
     }
+    if request.user.pk == attendee.pk:
+        context['calendar_feed_url'] = request.build_absolute_uri(
+            reverse('attendee_calendar_feed', args=[feed_token(attendee)])
+        )
 
     return render(request, 'attendee_dashboard.html', context)
 
 @login_required
+@read_replica
 def users_list_view(request):
     user = request.user
 
     if is_admin(user):
-        users = User.objects.all()
-        user_filter = UserFilter(request.GET, queryset=users)
+        user_filter = UserFilter(request.GET, queryset=User.objects.all())
         form = UserRegistrationForm()
-
-        paginator = Paginator(user_filter.qs, 20)
-        page_number = request.GET.get('page')
-
         try:
-            page_obj = paginator.page(page_number)
-        except PageNotAnInteger:
-            page_obj = paginator.page(1)
-        except EmptyPage:
-            page_obj = paginator.page(paginator.number_pages)
-        
+            before = int(request.GET['before']) if request.GET.get('before') else None
+            after = int(request.GET['after']) if request.GET.get('after') else None
+        except ValueError:
+            before = after = None
+
+        users, older, newer = user_search.keyset_page(user_filter.qs, before=before, after=after)
+
+        query = request.GET.copy()
+        for param in ('before', 'after', 'count'):
+            query.pop(param, None)
+        query_string = query.urlencode()
+        if request.GET.get('count') == 'exact':
+            total = user_search.exact_count(user_filter.qs, query_string)
+        else:
+            filtered = any(request.GET.get(name) for name in user_filter.filters)
+            total = user_search.estimated_count(user_filter.qs, filtered)
+
         context = {
-            'total_result': user_filter.qs.count(),
+            'total_result': total,
             'filter': user_filter,
-            'page_obj': page_obj,
+            'users': users,
+            'older_cursor': older,
+            'newer_cursor': newer,
+            'query_string': query_string,
             'form': form,
         }
 
-
         return render(request, 'admin/users.html', context)
     else:
         messages.warning(request, 'Only admin can access this page. Please contact the admin')
@@ -431,6 +417,43 @@ def get_user_profile_view(request, user_id):
     }
     return render(request, 'admin/user_profile.html', context)
 
+@login_required
+@user_passes_test(is_admin)
+def db_connection_stats(request):
+    '''Connection churn counters for this worker process'''
+    return JsonResponse(db_metrics.snapshot())
+
+@login_required
+def notifications_api(request):
+    '''GET a page of notifications, ?before=<id> for the next page and ?unread=1 for unread only'''
+    try:
+        before = int(request.GET['before']) if request.GET.get('before') else None
+        limit = min(int(request.GET.get('limit', notifications.INBOX_PAGE_SIZE)), notifications.MAX_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'before and limit must be integers'}, status=400)
+
+    rows, next_before = notifications.inbox_page(
+        request.user.id, before=before, limit=max(limit, 1), unread_only=request.GET.get('unread') == '1',
+    )
+    return JsonResponse({
+        'results': rows,
+        'next_before': next_before,
+        'unread_count': notifications.unread_count(request.user.id),
+    })
+
+@login_required
+def mark_notifications_read_api(request):
+    '''POST {"ids": [...]} to mark those notifications read, or {"all": true} for all of them'''
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'POST required'}, status=405)
+    try:
+        data = json.loads(request.body or '{}')
+        ids = None if data.get('all') else [int(notification_id) for notification_id in data['ids']]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'message': 'Expected {"ids": [...]} or {"all": true}'}, status=400)
+
+    return JsonResponse({'success': True, 'unread_count': notifications.mark_read(request.user.id, ids)})
+
 def edit_user_view(request, user_id):
     user = get_object_or_404(User, id=user_id)
     if request.method == 'POST':
@@ -439,10 +462,10 @@ def edit_user_view(request, user_id):
         if form.is_valid():
             user = form.save()
             messages.success(request, f'User {user.first_name} has successfully updated!!!')
-            print(user.first_name)
+            logger.info('User %s updated', user.id, editor=request.user.id)
             return redirect('user_profile', user_id=user.id)
         else:
-            print('The form is not valid')
+            logger.debug('Edit user form invalid', user=user.id, errors=list(form.errors))
     else:
         form = AdminUserChangeForm(instance=user)
     return render(request, 'admin/edit_user.html', {'user': user, 'form': form})
@@ -56,6 +56,8 @@ CHANNEL_LAYERS = {
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'event_app.middleware.RateLimitMiddleware',
+    'event_app.middleware.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -88,15 +90,88 @@ TEMPLATES = [
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        # MySQL with a process-wide connection pool, see event_app/db_backends/pool.py
+        'ENGINE': 'event_app.db_backends.mysql',
         'NAME': 'eventapp',  
         'USER': 'root',
         'PASSWORD': 'root',
         'HOST': 'localhost',
         'PORT': '3306',
+        # Under ASGI per-thread persistent connections are never reused, so
+        # connections go back to the pool at request end and are pinged on reuse
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+        'CONN_HEALTH_CHECKS': True,
+        'POOL_SIZE': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'POOL_MAX_AGE': 300,
     }
 }
 
+# Read replicas for reporting and listing views, see event_app/routers.py.
+# Set DB_REPLICA_HOST (and optionally DB_REPLICA_NAME) to enable one.
+DATABASE_ROUTERS = ['event_app.routers.ReplicaRouter']
+DATABASE_REPLICAS = []
+
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DB_REPLICA_HOST'],
+        'NAME': os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append('replica')
+
+REPLICA_MAX_LAG_SECONDS = 5
+REPLICA_STICKY_SECONDS = 10
+
+# Token-bucket limits per URL name, see event_app/ratelimit.py. REMOTE_ADDR
+# must be the client address, so behind a proxy set it from X-Forwarded-For.
+# Set RATE_LIMIT_CACHE to a cache alias to share buckets between workers.
+
+RATE_LIMITS = {
+    'register_for_event': {'methods': ['POST'], 'limits': [('ip', '10/m'), ('event', '100/s')]},
+    # views.attendee_login needs no policy, urls.py maps it to login/ after
+    # login_view so requests never resolve to it
+    'login': {'methods': ['POST'], 'limits': [('ip', '10/m')]},
+}
+RATE_LIMIT_CACHE = None
+
+# Trending scores halve after this long without new activity, see event_app/trending.py
+TRENDING_HALF_LIFE_HOURS = 24
+
+
+# Cache and sessions
+# Sessions are cached with DB write-through, see event_app/sessions.py.
+# Set REDIS_URL to share the cache between workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+if os.environ.get('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+
+# Cached sessions are only consistent across workers with a shared cache
+SESSION_ENGINE = 'event_app.sessions' if os.environ.get('REDIS_URL') else 'django.contrib.sessions.backends.db'
+
+
+# Queued registration ingest, see event_app/ingest.py. Needs the
+# process_registrations worker running on every web host and a shared
+# cache (REDIS_URL) so receipts can be polled from any worker.
+
+REGISTRATION_QUEUE_ENABLED = os.environ.get('REGISTRATION_QUEUE_ENABLED', '') == '1'
+REGISTRATION_QUEUE_PATH = os.environ.get('REGISTRATION_QUEUE_PATH', BASE_DIR / 'registration_queue.sqlite3')
+REGISTRATION_QUEUE_MAX = 10000
+
+# Where registration answers are written, see event_app/answers.py: 'rows'
+# (RegistrationFieldValue), 'dual' while migrate_registration_answers runs,
+# then 'json' (one document on EventRegistrations).
+REGISTRATION_ANSWERS_STORAGE = os.environ.get('REGISTRATION_ANSWERS_STORAGE', 'dual')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -150,4 +225,38 @@ ORGANIZER_WEBHOOK_URL = 'http://127.0.0.1:8000/webhooks/event-status/'
 ADMIN_WEBHOOK_URL = 'http://127.0.0.1:8000/webhooks/events/'
 
 LOGIN_URL = 'login'
-#LOGIN_REDIRECT_URL = 'dashboard'
\ No newline at end of file
+#LOGIN_REDIRECT_URL = 'dashboard'
+
+# Logging
+# event_app loggers write structured records through a non-blocking queue.
+# EVENT_APP_LOG_SAMPLING maps logger names to the fraction of DEBUG/INFO
+# records kept, warnings and errors are never sampled.
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'structured': {
+            '()': 'event_app.log.StructuredFormatter',
+            'format': '%(asctime)s %(levelname)s %(name)s %(message)s',
+        },
+    },
+    'handlers': {
+        'queue': {
+            '()': 'event_app.log.NonBlockingQueueHandler',
+            'formatter': 'structured',
+        },
+    },
+    'loggers': {
+        'event_app': {
+            'handlers': ['queue'],
+            'level': os.environ.get('EVENT_APP_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+EVENT_APP_LOG_SAMPLING = {
+    'event_app.views': 1.0,
+    'event_app.event_views': 1.0,
+}